@@ -0,0 +1,41 @@
+# Work the request handlers hand to the job workers (jobs.queue, run_workers)
+import logging
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+
+from .models import PendingUser
+
+logger = logging.getLogger(__name__)
+
+
+def send_verification_email(email, code):
+    subject = 'Verify Your Email - ShopSmart'
+    message = f'''
+    Your ShopSmart verification code is: 
+    
+    {code}
+    
+    Please enter this code to complete your registration.
+    This code is valid for 15 minutes.
+    
+    If you did not request this, please ignore this email.
+    '''
+
+    email_message = EmailMessage(
+        subject,
+        message,
+        settings.DEFAULT_FROM_EMAIL,
+        [email],
+    )
+    email_message.extra_headers = {
+        'Reply-To': settings.DEFAULT_FROM_EMAIL,
+        'X-Priority': '3',
+    }
+    # Errors propagate so the job is retried
+    email_message.send(fail_silently=False)
+    logger.info(f"Verification email sent to {email}")
+
+
+def cleanup_pending_users():
+    return PendingUser.cleanup_expired()
@@ -1,11 +1,12 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth import login, logout
 from django.http import JsonResponse
-from django.core.mail import send_mail, EmailMessage
 from django.conf import settings
 from django.views.decorators.http import require_POST
 from django.utils import timezone
 from django.urls import reverse
+from jobs.models import Job
+from jobs.queue import enqueue
 from .models import ShopOwnerProfile, CustomerProfile, User, PendingUser
 from .forms import (
     UserRegistrationForm,
@@ -15,6 +16,7 @@ from .forms import (
 )
 import random
 import logging
+from datetime import timedelta
 
 logger = logging.getLogger(__name__)
 
@@ -23,40 +25,12 @@ def is_ajax(request):
            request.META.get('HTTP_X_REQUESTED_WITH') == 'XMLHttpRequest'
 
 def send_verification_email(email, code):
-    try:
-        subject = 'Verify Your Email - ShopSmart'
-        message = f'''
-        Your ShopSmart verification code is: 
-        
-        {code}
-        
-        Please enter this code to complete your registration.
-        This code is valid for 15 minutes.
-        
-        If you did not request this, please ignore this email.
-        '''
-        
-        email_message = EmailMessage(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [email],
-        )
-        email_message.extra_headers = {
-            'Reply-To': settings.DEFAULT_FROM_EMAIL,
-            'X-Priority': '3',
-        }
-        result = email_message.send(fail_silently=False)
-        logger.info(f"Verification email sent to {email} with code {code}, result: {result}")
-        return True
-    except Exception as e:
-        logger.error(f"Failed to send email to {email}: {str(e)}")
-        return False
+    # Sent by the job workers so a slow mail server does not hold up the request;
+    # retried a few times within the code's 15 minutes
+    enqueue('accounts.tasks.send_verification_email', priority=Job.HIGH, max_attempts=4, email=email, code=code)
 
 def register_customer(request):
     if request.method == 'POST':
-        PendingUser.cleanup_expired()
-        
         user_form = UserRegistrationForm(request.POST)
         profile_form = CustomerRegistrationForm(request.POST)   
 
@@ -64,7 +38,13 @@ def register_customer(request):
             email = user_form.cleaned_data['email'].strip().lower()
 
             # Existing user check logic remains the same...
-            
+
+            # Expired sign-ups are cleared by a periodic job; clear this email's
+            # own one now so the new sign-up can take its place
+            PendingUser.objects.filter(
+                email__iexact=email, created_at__lt=timezone.now() - timedelta(hours=24)
+            ).delete()
+
             # Create profile_data with guaranteed phone
             profile_data = {
                 'phone': profile_form.cleaned_data['phone'],  # Already validated
@@ -89,12 +69,7 @@ def register_customer(request):
                 profile_data=profile_data,  # Now guaranteed to have phone
                 verification_code=code
             )
-            if not send_verification_email(email, code):
-                return render(request, 'accounts/register_customer.html', {
-                    'user_form': user_form,
-                    'profile_form': profile_form,
-                    'error': 'Failed to send verification email. Please try again later.'
-                })
+            send_verification_email(email, code)
 
             return redirect(f'/accounts/verify/?email={email}')
 
@@ -123,8 +98,6 @@ def register_customer(request):
 
 def register_shop_owner(request):
     if request.method == 'POST':
-        PendingUser.cleanup_expired()
-        
         user_form = UserRegistrationForm(request.POST)
         profile_form = ShopOwnerRegistrationForm(request.POST)
 
@@ -185,14 +158,7 @@ def register_shop_owner(request):
                 profile_data=profile_data,
                 verification_code=code
             )
-            if not send_verification_email(email, code):
-                if is_ajax(request):
-                    return JsonResponse({'error': 'Failed to send verification email. Please try again later.'}, status=400)
-                return render(request, 'accounts/register_shop.html', {
-                    'user_form': user_form,
-                    'profile_form': profile_form,
-                    'error': 'Failed to send verification email. Please try again later.'
-                })
+            send_verification_email(email, code)
 
             if is_ajax(request):
                 return JsonResponse({
@@ -411,8 +377,7 @@ def resend_verification_code(request):
         pending.created_at = timezone.now()
         pending.save()
 
-        if not send_verification_email(email, new_code):
-            return JsonResponse({'error': 'Failed to send verification email. Please try again later.'}, status=400)
+        send_verification_email(email, new_code)
 
         return JsonResponse({'message': 'A new code has been sent to your email.'}, status=200)
     
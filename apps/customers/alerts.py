@@ -0,0 +1,144 @@
+"""
+Back-in-stock and price-drop emails for wishlisted products.
+
+Recording is cheap and happens inside the shop owner's write: every
+stock/price/active change (``product_states_changed`` from shops.signals,
+sent by single saves, bulk operations and imports) is diffed and a
+matching ProductAlert row is inserted. Nothing per customer happens there.
+
+``send_alerts`` (the ``send_wishlist_alerts`` command) does the fan-out
+later. Pending alerts for the same product and kind are merged into one,
+alerts that no longer hold (sold out again, price back up) are dropped,
+and the product's wishlisters are read in user-id chunks. Each chunk's
+emails go out over one mail connection. Progress is saved on the alert
+after every chunk, so an interrupted run resumes without repeating emails.
+"""
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import ProductAlert, Wishlist
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_SITE_URL = 'https://shopsmart.pythonanywhere.com'
+
+
+def alert_kinds(before, after):
+    """Alert kinds for one product going from state ``before`` to ``after``."""
+    old_stock, old_price, was_active = before
+    stock, price, is_active = after
+    kinds = []
+    if is_active and stock > 0 and not (was_active and old_stock > 0):
+        kinds.append(ProductAlert.BACK_IN_STOCK)
+    if is_active and was_active and price < old_price:
+        kinds.append(ProductAlert.PRICE_DROP)
+    return kinds
+
+
+def record_alerts(changes):
+    """Insert alerts for (product_id, before, after) changes, in one statement."""
+    alerts = [
+        ProductAlert(product_id=product_id, kind=kind, old_price=before[1], new_price=after[1])
+        for product_id, before, after in changes
+        for kind in alert_kinds(before, after)
+    ]
+    if alerts:
+        ProductAlert.objects.bulk_create(alerts)
+    return len(alerts)
+
+
+def _still_holds(alert, product):
+    if not product.is_active or product.stock == 0:
+        return False
+    if alert.kind == ProductAlert.PRICE_DROP:
+        return product.price < alert.old_price
+    return True
+
+
+def _merge_pending():
+    """
+    One alert per (product, kind): the oldest pending one, carrying the
+    earliest old price and the new price of the latest one. The others are
+    marked sent without emails.
+    """
+    keep, merged, repriced = {}, [], {}
+    pending = (
+        ProductAlert.objects.filter(sent_at__isnull=True)
+        .select_related('product__shop_owner').order_by('id')
+    )
+    for alert in pending.iterator(chunk_size=DEFAULT_CHUNK_SIZE):
+        key = (alert.product_id, alert.kind)
+        if key in keep:
+            merged.append(alert.pk)
+            if keep[key].new_price != alert.new_price:
+                keep[key].new_price = alert.new_price
+                repriced[key] = keep[key]
+        else:
+            keep[key] = alert
+    if merged:
+        ProductAlert.objects.filter(pk__in=merged).update(sent_at=timezone.now())
+    if repriced:
+        ProductAlert.objects.bulk_update(repriced.values(), ['new_price'])
+    return list(keep.values())
+
+
+def _message(alert, product, site_url):
+    url = site_url + reverse('customers:product_detail', args=[product.pk])
+    if alert.kind == ProductAlert.BACK_IN_STOCK:
+        subject = f'Back in stock: {product.name} - ShopSmart'
+        line = f'{product.name} from {product.shop_owner.shop_name} is back in stock at ¢{product.price}.'
+    else:
+        subject = f'Price drop: {product.name} - ShopSmart'
+        line = f'{product.name} from {product.shop_owner.shop_name} is now ¢{product.price} (was ¢{alert.old_price}).'
+    body = (
+        f'{line}\n\nSee it here: {url}\n\n'
+        'You are getting this email because the product is in your ShopSmart wishlist.\n'
+    )
+    return subject, body
+
+
+def fan_out(alert, connection, chunk_size=DEFAULT_CHUNK_SIZE, site_url=None):
+    """Email every customer wishlisting the alert's product, one chunk at a time."""
+    product = alert.product
+    subject, body = _message(alert, product, site_url or getattr(settings, 'SITE_URL', DEFAULT_SITE_URL))
+    wishlisters = (
+        Wishlist.objects.filter(product_id=alert.product_id)
+        .order_by('user_id')
+        .values_list('user_id', 'user__email', 'user__first_name')
+    )
+    while True:
+        rows = list(wishlisters.filter(user_id__gt=alert.last_user_id)[:chunk_size])
+        if not rows:
+            break
+        messages = [
+            EmailMessage(subject, f'Hi {first_name or "there"},\n\n{body}', settings.DEFAULT_FROM_EMAIL, [email])
+            for _, email, first_name in rows
+        ]
+        connection.send_messages(messages)
+        alert.last_user_id = rows[-1][0]
+        alert.recipients += len(rows)
+        alert.save(update_fields=['last_user_id', 'recipients'])
+
+    alert.sent_at = timezone.now()
+    alert.save(update_fields=['sent_at'])
+
+
+def send_alerts(chunk_size=DEFAULT_CHUNK_SIZE):
+    """Send every pending alert. Returns (alerts sent, emails sent)."""
+    with transaction.atomic():
+        alerts = _merge_pending()
+
+    sent = emails = 0
+    connection = get_connection()
+    with connection:
+        for alert in alerts:
+            if not _still_holds(alert, alert.product):
+                ProductAlert.objects.filter(pk=alert.pk).update(sent_at=timezone.now())
+                continue
+            before = alert.recipients
+            fan_out(alert, connection, chunk_size)
+            sent += 1
+            emails += alert.recipients - before
+    return sent, emails
@@ -0,0 +1,45 @@
+"""
+ETag for the customer product page (see shops.conditional).
+
+The page shows the product and its shop, reviews and related products
+(covered by the catalog version), the similar and "also saved" lists
+(covered by the recommendations version, bumped when build_similar_products
+or build_recommendations rewrite them) and the customer's wishlist hearts
+(covered by their wishlist version). The versions live in the cache, so
+validating costs the one product lookup. The CSRF secret is part of the
+tag so a page kept from before a login never replays a stale form token.
+"""
+import hashlib
+
+from django.contrib.messages import get_messages
+from django.middleware.csrf import get_token
+
+from shops.conditional import request_memo
+from shops.models import Product
+
+from .querycache import catalog_version, recommendations_version, wishlist_version
+
+
+def product_detail_etag(request, pk):
+    # Flash messages are shown once, so a page carrying them is never a 304
+    if len(get_messages(request)):
+        return None
+    product = request_memo(request, 'product_detail', lambda: (
+        Product.objects.filter(pk=pk, is_active=True)
+        .values_list('updated_at', 'shop_owner__updated_at')
+        .first()
+    ))
+    if product is None:
+        return None
+    get_token(request)  # Makes sure the secret used below is the one the page will carry
+    parts = (
+        pk,
+        *(moment.timestamp() for moment in product),
+        catalog_version(),
+        recommendations_version(),
+        request.user.pk,
+        wishlist_version(request.user.pk),
+        request.META.get('CSRF_COOKIE', ''),
+    )
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return f'W/"{digest}"'
@@ -0,0 +1,374 @@
+"""
+Faceted filtering for the customer catalog.
+
+Every product's facet values (price bucket, stock level, shop, city and
+rating) are held in NumPy columns, one row per product. A facet selection is
+a boolean mask per facet, filtering is the AND of the masks and the counts
+shown next to each option are a ``bincount`` over the rows the *other*
+selected facets allow, so a request never runs a GROUP BY.
+
+Like the search-box indexes in the shops app, the columns are built on first
+use, updated in place from model signals (customers.signals) and rebuilt in
+the background after FACET_INDEX_MAX_AGE seconds, or after ``clear()``, to
+pick up writes made elsewhere (shops.indexes).
+"""
+import time
+from decimal import Decimal
+
+import numpy as np
+
+from accounts.models import ShopOwnerProfile
+from shops.indexes import InMemoryIndex
+from shops.models import LOW_STOCK_THRESHOLD, Product
+
+from .models import ProductRating
+
+# (value, label, lower bound inclusive); the upper bound is the next lower bound
+PRICE_BUCKETS = [
+    ('0-10', 'Under GH₵ 10', Decimal('0')),
+    ('10-50', 'GH₵ 10 – 50', Decimal('10')),
+    ('50-100', 'GH₵ 50 – 100', Decimal('50')),
+    ('100-500', 'GH₵ 100 – 500', Decimal('100')),
+    ('500+', 'GH₵ 500 and above', Decimal('500')),
+]
+
+STOCK_LEVELS = [
+    ('in', 'In stock'),
+    ('low', 'Low stock'),
+    ('out', 'Out of stock'),
+]
+
+# Minimum average rating; "no reviews" is stored as 0
+RATING_LEVELS = [
+    (4, '4★ & up'),
+    (3, '3★ & up'),
+    (2, '2★ & up'),
+    (1, '1★ & up'),
+]
+
+FACET_KEYS = ('price', 'stock', 'shop', 'city', 'rating')
+MAX_SHOP_OPTIONS = 10
+MAX_CITY_OPTIONS = 10
+
+
+def price_bucket(price):
+    price = Decimal(str(price))
+    bucket = 0
+    for i, (_, _, lower) in enumerate(PRICE_BUCKETS):
+        if price >= lower:
+            bucket = i
+    return bucket
+
+
+def stock_level(stock):
+    if stock == 0:
+        return 2
+    if stock <= LOW_STOCK_THRESHOLD:
+        return 1
+    return 0
+
+
+def normalize_city(city):
+    return ' '.join((city or '').split()).title()
+
+
+def parse_selection(params):
+    """Read the selected facet options from request parameters."""
+    selection = {}
+    price_values = [value for value, _, _ in PRICE_BUCKETS]
+    prices = {price_values.index(v) for v in params.getlist('price') if v in price_values}
+    if prices:
+        selection['price'] = prices
+
+    stock_values = [value for value, _ in STOCK_LEVELS]
+    stocks = {stock_values.index(v) for v in params.getlist('stock') if v in stock_values}
+    if stocks:
+        selection['stock'] = stocks
+
+    shops = {int(v) for v in params.getlist('shop') if v.isdigit()}
+    if shops:
+        selection['shop'] = shops
+
+    cities = {normalize_city(v) for v in params.getlist('city') if v.strip()}
+    if cities:
+        selection['city'] = cities
+
+    rating = params.get('rating', '')
+    if rating.isdigit() and 1 <= int(rating) <= 5:
+        selection['rating'] = int(rating)
+    return selection
+
+
+class FacetIndex(InMemoryIndex):
+    max_age_setting = 'FACET_INDEX_MAX_AGE'
+
+    def __init__(self):
+        super().__init__()
+        self._size = 0
+        self._rows = {}          # product_id -> row
+        self._shop_names = {}    # shop_id -> shop_name
+        self._shop_cities = {}   # shop_id -> city code
+        self._cities = []        # city code -> name
+        self._city_codes = {}    # name -> city code
+        self._allocate(0)
+
+    def _allocate(self, capacity):
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._active = np.zeros(capacity, dtype=bool)
+        self._price = np.zeros(capacity, dtype=np.int8)
+        self._stock = np.zeros(capacity, dtype=np.int8)
+        self._shop = np.zeros(capacity, dtype=np.int64)
+        self._city = np.zeros(capacity, dtype=np.int32)
+        self._rating = np.zeros(capacity, dtype=np.int8)
+
+    def _columns(self):
+        return ('_ids', '_active', '_price', '_stock', '_shop', '_city', '_rating')
+
+    def _city_code(self, city):
+        city = normalize_city(city)
+        if city not in self._city_codes:
+            self._city_codes[city] = len(self._cities)
+            self._cities.append(city)
+        return self._city_codes[city]
+
+    # Building
+
+    def build(self):
+        ratings = dict(ProductRating.objects.filter(count__gt=0).values_list('product_id', 'average'))
+        shops = list(ShopOwnerProfile.objects.values_list('id', 'shop_name', 'city'))
+        products = list(
+            Product.objects.values_list('id', 'price', 'stock', 'is_active', 'shop_owner_id')
+            .iterator(chunk_size=2000)
+        )
+
+        # Built aside and swapped in, so lookups keep using the current columns meanwhile
+        cities, city_codes = [], {}
+
+        def city_code(city):
+            city = normalize_city(city)
+            if city not in city_codes:
+                city_codes[city] = len(cities)
+                cities.append(city)
+            return city_codes[city]
+
+        shop_names = {pk: name for pk, name, _ in shops}
+        shop_cities = {pk: city_code(city) for pk, _, city in shops}
+        no_city = city_code('')
+        columns = {
+            '_ids': np.array([pk for pk, _, _, _, _ in products], dtype=np.int64),
+            '_active': np.array([is_active for _, _, _, is_active, _ in products], dtype=bool),
+            '_price': np.array([price_bucket(price) for _, price, _, _, _ in products], dtype=np.int8),
+            '_stock': np.array([stock_level(stock) for _, _, stock, _, _ in products], dtype=np.int8),
+            '_shop': np.array([shop_id for _, _, _, _, shop_id in products], dtype=np.int64),
+            '_city': np.array(
+                [shop_cities.get(shop_id, no_city) for _, _, _, _, shop_id in products], dtype=np.int32,
+            ),
+            '_rating': np.array([int(ratings.get(pk) or 0) for pk, _, _, _, _ in products], dtype=np.int8),
+        }
+        rows = {pk: row for row, (pk, _, _, _, _) in enumerate(products)}
+
+        with self._lock:
+            for name, column in columns.items():
+                setattr(self, name, column)
+            self._rows = rows
+            self._size = len(products)
+            self._cities, self._city_codes = cities, city_codes
+            self._shop_names = shop_names
+            self._shop_cities = shop_cities
+            self._built_at = time.monotonic()
+
+    def _set_row(self, row, pk, price, stock, is_active, shop_id, average_rating):
+        self._ids[row] = pk
+        self._active[row] = is_active
+        self._price[row] = price_bucket(price)
+        self._stock[row] = stock_level(stock)
+        self._shop[row] = shop_id
+        self._city[row] = self._shop_cities.get(shop_id, self._city_code(''))
+        self._rating[row] = int(average_rating or 0)
+
+    # Incremental updates
+
+    def update_product(self, product):
+        with self._lock:
+            if self._built_at is None:
+                return
+            row = self._rows.get(product.pk)
+            if row is None:
+                row = self._append_row(product.pk)
+                rating = None
+            else:
+                rating = self._rating[row]
+            self._set_row(
+                row, product.pk, product.price, product.stock, product.is_active,
+                product.shop_owner_id, rating,
+            )
+
+    def remove_product(self, pk):
+        with self._lock:
+            row = self._rows.get(pk) if self._built_at is not None else None
+            if row is not None:
+                self._active[row] = False
+
+    def update_rating(self, pk, average_rating):
+        with self._lock:
+            row = self._rows.get(pk) if self._built_at is not None else None
+            if row is not None:
+                self._rating[row] = int(average_rating or 0)
+
+    def update_shop(self, shop):
+        with self._lock:
+            if self._built_at is None:
+                return
+            self._shop_names[shop.pk] = shop.shop_name
+            code = self._city_code(shop.city)
+            self._shop_cities[shop.pk] = code
+            size = self._size
+            self._city[:size][self._shop[:size] == shop.pk] = code
+
+    def _append_row(self, pk):
+        if self._size == len(self._ids):
+            capacity = max(16, len(self._ids) * 2)
+            for name in self._columns():
+                column = getattr(self, name)
+                grown = np.zeros(capacity, dtype=column.dtype)
+                grown[:self._size] = column[:self._size]
+                setattr(self, name, grown)
+        row = self._size
+        self._size += 1
+        self._rows[pk] = row
+        return row
+
+    # Queries
+
+    def _masks(self, selection):
+        size = self._size
+        masks = {}
+        if 'price' in selection:
+            masks['price'] = np.isin(self._price[:size], list(selection['price']))
+        if 'stock' in selection:
+            masks['stock'] = np.isin(self._stock[:size], list(selection['stock']))
+        if 'shop' in selection:
+            masks['shop'] = np.isin(self._shop[:size], list(selection['shop']))
+        if 'city' in selection:
+            codes = [self._city_codes[c] for c in selection['city'] if c in self._city_codes]
+            masks['city'] = np.isin(self._city[:size], codes)
+        if 'rating' in selection:
+            masks['rating'] = self._rating[:size] >= selection['rating']
+        return masks
+
+    def filter_and_count(self, selection, candidate_ids=None):
+        """
+        Apply ``selection`` (from parse_selection) to the active catalog, or
+        to ``candidate_ids`` if given, e.g. search results.
+
+        Returns (product_ids, counts). ``product_ids`` keeps the candidate
+        order (newest first without candidates) and is None when nothing
+        narrows the catalog. ``counts`` maps each facet to {option: count}.
+        """
+        self.ensure_built()
+        with self._lock:
+            size = self._size
+            base = self._active[:size].copy()
+            if candidate_ids is not None:
+                base &= np.isin(self._ids[:size], np.asarray(candidate_ids, dtype=np.int64))
+            masks = self._masks(selection)
+
+            counts = {}
+            for key in FACET_KEYS:
+                allowed = base.copy()
+                for other, mask in masks.items():
+                    if other != key:
+                        allowed &= mask
+                counts[key] = self._count(key, allowed)
+
+            if not masks and candidate_ids is None:
+                return None, counts
+
+            matched = base
+            for mask in masks.values():
+                matched = matched & mask
+            matched_ids = self._ids[:size][matched]
+
+        if candidate_ids is None:
+            return np.sort(matched_ids)[::-1].tolist(), counts
+        keep = set(matched_ids.tolist())
+        return [pk for pk in candidate_ids if pk in keep], counts
+
+    def _count(self, key, allowed):
+        if key == 'price':
+            tally = np.bincount(self._price[:self._size][allowed], minlength=len(PRICE_BUCKETS))
+            return {i: int(n) for i, n in enumerate(tally)}
+        if key == 'stock':
+            tally = np.bincount(self._stock[:self._size][allowed], minlength=len(STOCK_LEVELS))
+            return {i: int(n) for i, n in enumerate(tally)}
+        if key == 'rating':
+            tally = np.bincount(self._rating[:self._size][allowed], minlength=6)
+            at_least = np.cumsum(tally[::-1])[::-1]
+            return {level: int(at_least[level]) for level, _ in RATING_LEVELS}
+        column = self._shop if key == 'shop' else self._city
+        values, tally = np.unique(column[:self._size][allowed], return_counts=True)
+        return dict(zip(values.tolist(), tally.tolist()))
+
+    def options(self, selection, counts, params):
+        """Facet options for the template, each with its toggle query string."""
+        facets = []
+        facets.append(self._facet(
+            'price', 'Price', params, selection,
+            [(value, label, counts['price'][i], i) for i, (value, label, _) in enumerate(PRICE_BUCKETS)],
+        ))
+        facets.append(self._facet(
+            'stock', 'Availability', params, selection,
+            [(value, label, counts['stock'][i], i) for i, (value, label) in enumerate(STOCK_LEVELS)],
+        ))
+        shops = sorted(counts['shop'].items(), key=lambda item: -item[1])[:MAX_SHOP_OPTIONS]
+        facets.append(self._facet(
+            'shop', 'Shop', params, selection,
+            [(str(pk), self._shop_names.get(pk, ''), n, pk) for pk, n in shops],
+        ))
+        cities = sorted(counts['city'].items(), key=lambda item: -item[1])
+        facets.append(self._facet(
+            'city', 'City', params, selection,
+            [(self._cities[code], self._cities[code], n, self._cities[code])
+             for code, n in cities if self._cities[code]][:MAX_CITY_OPTIONS],
+        ))
+        facets.append(self._facet(
+            'rating', 'Rating', params, selection,
+            [(str(level), label, counts['rating'][level], level) for level, label in RATING_LEVELS],
+            single=True,
+        ))
+        return facets
+
+    def _facet(self, key, label, params, selection, options, single=False):
+        chosen = selection.get(key)
+        rendered = []
+        for value, option_label, count, selected_value in options:
+            if single:
+                selected = chosen == selected_value
+            else:
+                selected = chosen is not None and selected_value in chosen
+            if not count and not selected:
+                continue
+            rendered.append({
+                'value': value,
+                'label': option_label,
+                'count': count,
+                'selected': selected,
+                'query': _toggle(params, key, value, selected, single),
+            })
+        return {'key': key, 'label': label, 'options': rendered}
+
+
+def _toggle(params, key, value, selected, single):
+    query = params.copy()
+    query.pop('page', None)
+    if 'cursor' in query:
+        query['cursor'] = ''  # Restart from the first page, still in cursor mode
+    same = normalize_city if key == 'city' else str
+    values = [] if single else [v for v in query.getlist(key) if same(v) != value]
+    if not selected:
+        values.append(value)
+    query.setlist(key, values)
+    return query.urlencode()
+
+
+facet_index = FacetIndex()
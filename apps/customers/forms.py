@@ -10,3 +10,9 @@ class ReviewForm(forms.ModelForm):
             'rating': forms.NumberInput(attrs={'min': 1, 'max': 5}),
             'comment': forms.Textarea(attrs={'rows': 3, 'placeholder': 'Write your review...'}),
         }
+
+    def clean_rating(self):
+        rating = self.cleaned_data['rating']
+        if not 1 <= rating <= 5:
+            raise forms.ValidationError('Rating must be between 1 and 5')
+        return rating
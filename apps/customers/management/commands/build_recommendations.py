@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from customers.recommendations import build_recommendations, DEFAULT_TOP_K, DEFAULT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds "customers who saved this also saved" lists from wishlists and reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K, help='Recommendations stored per product and per customer')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Matrix rows multiplied at a time')
+
+    def handle(self, *args, **options):
+        products, users = build_recommendations(top_k=options['top_k'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Stored recommendations for {products} products and {users} customers'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from customers.similarity import build_similarities, DEFAULT_TOP_K, DEFAULT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Computes TF-IDF "similar products" for products added or edited since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute neighbours for every product')
+        parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K, help='Neighbours stored per product')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows multiplied at a time')
+
+    def handle(self, *args, **options):
+        count = build_similarities(
+            full=options['full'],
+            top_k=options['top_k'],
+            chunk_size=options['chunk_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Updated similar products for {count} products'))
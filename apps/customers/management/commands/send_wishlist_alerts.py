@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from customers.alerts import DEFAULT_CHUNK_SIZE, send_alerts
+
+
+class Command(BaseCommand):
+    help = 'Emails customers whose wishlisted products came back in stock or dropped in price'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Wishlisters read and emailed per batch')
+
+    def handle(self, *args, **options):
+        alerts, emails = send_alerts(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Sent {alerts} alerts in {emails} emails'))
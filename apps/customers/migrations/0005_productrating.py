@@ -0,0 +1,49 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_ratings(apps, schema_editor):
+    Review = apps.get_model('customers', 'Review')
+    ProductRating = apps.get_model('customers', 'ProductRating')
+    rows = (
+        Review.objects.values('product_id')
+        .annotate(
+            count=Count('id'),
+            total=Sum('rating'),
+            **{f'stars_{stars}': Count('id', filter=Q(rating=stars)) for stars in range(1, 6)},
+        )
+        .order_by()
+    )
+    ProductRating.objects.bulk_create(
+        [ProductRating(average=row['total'] / row['count'], **row) for row in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0004_recommendations'),
+        ('shops', '0008_shopstats_leaderboard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRating',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating', serialize=False, to='shops.product')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('stars_1', models.PositiveIntegerField(default=0)),
+                ('stars_2', models.PositiveIntegerField(default=0)),
+                ('stars_3', models.PositiveIntegerField(default=0)),
+                ('stars_4', models.PositiveIntegerField(default=0)),
+                ('stars_5', models.PositiveIntegerField(default=0)),
+                ('average', models.FloatField(db_index=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
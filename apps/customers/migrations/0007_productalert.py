@@ -0,0 +1,43 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0006_review_page_indexes'),
+        ('shops', '0008_shopstats_leaderboard'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('back_in_stock', 'Back in stock'), ('price_drop', 'Price drop')], max_length=20)),
+                ('old_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('new_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_user_id', models.PositiveBigIntegerField(default=0)),
+                ('recipients', models.PositiveIntegerField(default=0)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='wishlist',
+            index=models.Index(fields=['product', 'user'], name='wishlist_product_user_idx'),
+        ),
+        migrations.AddField(
+            model_name='productalert',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='shops.product'),
+        ),
+        migrations.AddIndex(
+            model_name='productalert',
+            index=models.Index(fields=['sent_at', 'id'], name='productalert_pending_idx'),
+        ),
+    ]
@@ -11,6 +11,8 @@ class Wishlist(models.Model):
 
     class Meta:
         unique_together = ('user', 'product')
+        # Walking a product's wishlisters in user order (customers/alerts.py)
+        indexes = [models.Index(fields=['product', 'user'], name='wishlist_product_user_idx')]
 
     def __str__(self):
         return f"{self.user.email} wishes {self.product.name}"
@@ -26,6 +28,88 @@ class Review(models.Model):
     class Meta:
         unique_together = ('user', 'product')  # One review per user per product
         ordering = ['-created_at']
+        # Keyset pages of a product's reviews, all or by star rating (product_reviews view)
+        indexes = [
+            models.Index(fields=['product', '-created_at', '-id'], name='review_product_page_idx'),
+            models.Index(fields=['product', 'rating', '-created_at', '-id'], name='review_product_rating_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.product.name} ({self.rating}★)"
+
+
+# precomputed content-based neighbours, see customers/similarity.py
+class ProductSimilarity(models.Model):
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='similarity')
+    similar_ids = models.JSONField(default=list)  # most similar first
+    scores = models.JSONField(default=list)  # cosine similarity per id
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Similar to {self.product_id}: {self.similar_ids}"
+
+
+# precomputed "customers who saved this also saved", see customers/recommendations.py
+class ProductRecommendation(models.Model):
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='co_saved')
+    product_ids = models.JSONField(default=list)  # best first
+    scores = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Saved with {self.product_id}: {self.product_ids}"
+
+
+class UserRecommendation(models.Model):
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='recommendations')
+    product_ids = models.JSONField(default=list)  # best first
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Recommended for {self.user_id}: {self.product_ids}"
+
+
+# Review aggregates per product, kept current by customers/ratings.py
+class ProductRating(models.Model):
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='rating')
+    count = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)  # sum of all ratings
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+    average = models.FloatField(null=True, db_index=True)  # total / count, stored so lists can sort on it
+
+    def histogram(self):
+        """(stars, count, percent) from 5 stars down to 1."""
+        rows = []
+        for stars in range(5, 0, -1):
+            count = getattr(self, f'stars_{stars}')
+            rows.append((stars, count, round(100 * count / self.count) if self.count else 0))
+        return rows
+
+    def __str__(self):
+        return f"{self.product_id}: {self.average} from {self.count} reviews"
+
+
+# A wishlisted product came back in stock or got cheaper; sent by customers/alerts.py
+class ProductAlert(models.Model):
+    BACK_IN_STOCK = 'back_in_stock'
+    PRICE_DROP = 'price_drop'
+    KIND_CHOICES = [(BACK_IN_STOCK, 'Back in stock'), (PRICE_DROP, 'Price drop')]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='alerts')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    old_price = models.DecimalField(max_digits=10, decimal_places=2)
+    new_price = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_user_id = models.PositiveBigIntegerField(default=0)  # fan-out progress, so a rerun resumes
+    recipients = models.PositiveIntegerField(default=0)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['sent_at', 'id'], name='productalert_pending_idx')]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.product_id}"
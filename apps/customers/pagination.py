@@ -0,0 +1,131 @@
+"""
+Cursor (keyset) pagination.
+
+Instead of ``OFFSET`` and a ``COUNT(*)`` over the whole result, each page
+remembers the sort key of its first and last rows in an opaque token and the
+next page is fetched with a ``WHERE key < last`` seek on an indexed column, so
+page 500 costs the same as page 1.
+"""
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class CursorPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None, count=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.count = count  # Approximate, may be None
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(data):
+    raw = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return the cursor payload, or None for a missing or malformed token."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, binascii.Error):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def keyset_paginate(queryset, ordering, cursor=None, per_page=12):
+    """
+    Page ``queryset`` by the unique sort key ``ordering``, e.g. ('-id',) or
+    ('-created_at', '-id'). ``cursor`` is a token from a previous page.
+    """
+    data = decode_cursor(cursor)
+    forward = True
+    if data:
+        try:
+            values = _to_python(queryset.model, ordering, data['v'])
+            forward = data.get('d') != 'p'
+        except (KeyError, TypeError, ValueError, ValidationError):
+            data = None
+
+    page_ordering = ordering if forward else tuple(_flip(field) for field in ordering)
+    qs = queryset.order_by(*page_ordering)
+    if data:
+        qs = qs.filter(_seek(ordering, values, forward))
+
+    rows = list(qs[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_more or not forward:
+            next_cursor = encode_cursor({'v': _key(rows[-1], ordering), 'd': 'n'})
+        if data and (forward or has_more):
+            previous_cursor = encode_cursor({'v': _key(rows[0], ordering), 'd': 'p'})
+    return CursorPage(rows, next_cursor, previous_cursor)
+
+
+def sequence_paginate(items, cursor=None, per_page=12):
+    """Cursor pagination over an in-memory sequence, e.g. ranked search ids."""
+    data = decode_cursor(cursor) or {}
+    offset = data.get('o', 0)
+    if not isinstance(offset, int) or offset < 0:
+        offset = 0
+
+    rows = list(items[offset:offset + per_page])
+    next_cursor = previous_cursor = None
+    if offset + per_page < len(items):
+        next_cursor = encode_cursor({'o': offset + per_page})
+    if offset > 0:
+        previous_cursor = encode_cursor({'o': max(offset - per_page, 0)})
+    return CursorPage(rows, next_cursor, previous_cursor, count=len(items))
+
+
+def _flip(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+def _key(obj, ordering):
+    return [getattr(obj, field.lstrip('-')) for field in ordering]
+
+
+def _to_python(model, ordering, values):
+    if len(values) != len(ordering):
+        raise ValueError('Cursor does not match ordering')
+    return [
+        model._meta.get_field(field.lstrip('-')).to_python(value)
+        for field, value in zip(ordering, values)
+    ]
+
+
+def _seek(ordering, values, forward):
+    # (a, b) after (a0, b0)  ==  a > a0 OR (a = a0 AND b > b0)
+    condition = Q()
+    equal = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') == forward else 'gt'
+        condition |= Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+    return condition
@@ -0,0 +1,134 @@
+"""
+Versioned cache of catalog search results.
+
+Entries are keyed by the catalog version plus the normalized request (search
+text, location, facet selection). Any Product, ShopOwnerProfile or Review
+change bumps the version (customers.signals), which makes every older entry
+unreachable at once; those entries then age out of the LRU. The version
+counter lives in Django's cache so a shared cache backend invalidates all
+worker processes together.
+
+Entries are held in-process and evicted least-recently-used first once their
+pickled size would exceed SEARCH_RESULT_CACHE_MAX_BYTES.
+"""
+import pickle
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'catalog:version'
+WISHLIST_VERSION_KEY = 'wishlist:version:{user_id}'
+RECOMMENDATIONS_VERSION_KEY = 'recommendations:version'
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Key missing (first write or evicted): any new value invalidates
+        cache.set(key, _version(key) + 1, timeout=None)
+
+
+def catalog_version():
+    return _version(VERSION_KEY)
+
+
+def bump_catalog_version():
+    _bump(VERSION_KEY)
+
+
+# Per-customer counter bumped on wishlist changes, used in product page ETags
+def wishlist_version(user_id):
+    return _version(WISHLIST_VERSION_KEY.format(user_id=user_id))
+
+
+def bump_wishlist_version(user_id):
+    _bump(WISHLIST_VERSION_KEY.format(user_id=user_id))
+
+
+# Bumped when the similar-product or co-saved lists are rebuilt, used in product page ETags
+def recommendations_version():
+    return _version(RECOMMENDATIONS_VERSION_KEY)
+
+
+def bump_recommendations_version():
+    _bump(RECOMMENDATIONS_VERSION_KEY)
+
+
+class QueryResultCache:
+    def __init__(self, max_bytes=None):
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_bytes(self):
+        if self._max_bytes is not None:
+            return self._max_bytes
+        return getattr(settings, 'SEARCH_RESULT_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+
+    def get_or_compute(self, key, compute):
+        key = (catalog_version(), key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        value = compute()
+        self._store(key, value)
+        return value
+
+    def _store(self, key, value):
+        size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        max_bytes = self.max_bytes
+        if size > max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'version': catalog_version(),
+            }
+
+
+result_cache = QueryResultCache()
@@ -0,0 +1,81 @@
+"""
+Stored review aggregates per product (ProductRating).
+
+``save_review`` creates or updates a customer's review and moves the
+product's count, sum and star histogram with one
+``UPDATE ... SET col = col + n`` in the same transaction, so pages read the
+row instead of aggregating reviews. The stored average is recomputed in
+that same statement. Deleted reviews (including ones removed with their
+customer) are taken out by the post_delete signal (customers.signals).
+``refresh_rating`` rebuilds a row from the reviews table; it creates the
+row on a product's first review.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FloatField, Q, Sum
+from django.db.models.functions import Cast, NullIf
+
+from .facets import facet_index
+from .models import ProductRating, Review
+
+STARS = range(1, 6)
+
+
+def refresh_rating(product_id):
+    counts = Review.objects.filter(product_id=product_id).aggregate(
+        count=Count('id'),
+        total=Sum('rating', default=0),
+        **{f'stars_{stars}': Count('id', filter=Q(rating=stars)) for stars in STARS},
+    )
+    counts['average'] = counts['total'] / counts['count'] if counts['count'] else None
+    rating, _ = ProductRating.objects.update_or_create(product_id=product_id, defaults=counts)
+    return rating
+
+
+def apply_rating_change(product_id, removed=None, added=None):
+    """Take one ``removed`` rating out of the product's aggregates and put ``added`` in."""
+    count = (added is not None) - (removed is not None)
+    total = (added or 0) - (removed or 0)
+    changes = {}
+    if removed is not None:
+        changes[f'stars_{removed}'] = -1
+    if added is not None:
+        changes[f'stars_{added}'] = changes.get(f'stars_{added}', 0) + 1
+    changes = {field: F(field) + n for field, n in changes.items() if n}
+    if count:
+        changes['count'] = F('count') + count
+    if total:
+        changes['total'] = F('total') + total
+    if not changes:
+        return
+
+    # SET expressions see the old column values, so the deltas are applied here too
+    average = Cast(F('total') + total, FloatField()) / NullIf(F('count') + count, 0)
+    updated = ProductRating.objects.filter(product_id=product_id).update(average=average, **changes)
+    if not updated:
+        if added is None:
+            return  # Nothing stored yet, or the product is being deleted
+        refresh_rating(product_id)
+    average = ProductRating.objects.filter(product_id=product_id).values_list('average', flat=True).first()
+    facet_index.update_rating(product_id, average)
+
+
+def save_review(user, product, rating, comment):
+    """Create or update ``user``'s review of ``product`` and its aggregates. Returns (review, created)."""
+    with transaction.atomic():
+        review = Review.objects.select_for_update().filter(user=user, product=product).first()
+        if review is None:
+            try:
+                with transaction.atomic():
+                    review = Review.objects.create(user=user, product=product, rating=rating, comment=comment)
+            except IntegrityError:
+                # A second submit got there first; update its review instead
+                review = Review.objects.select_for_update().get(user=user, product=product)
+            else:
+                apply_rating_change(product.pk, added=rating)
+                return review, True
+
+        previous = review.rating
+        review.rating, review.comment = rating, comment
+        review.save(update_fields=['rating', 'comment'])
+        apply_rating_change(product.pk, removed=previous, added=rating)
+    return review, False
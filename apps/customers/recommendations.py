@@ -0,0 +1,177 @@
+"""
+"Customers who saved this also saved" recommendations.
+
+``build_recommendations`` reads who saved (Wishlist) or rated well (Review)
+which products into a sparse users x products matrix. Two products are
+similar when the same customers saved both: the cosine of their columns,
+computed in chunks with SciPy so the full item x item matrix is never held
+in memory. Each product keeps its top-k neighbours, and each customer gets
+the products whose neighbours they saved most, minus what they already
+have. Both lists are stored (ProductRecommendation, UserRecommendation) so
+pages only read one row. It is run by the ``build_recommendations``
+management command.
+"""
+import numpy as np
+from django.db import transaction
+from scipy import sparse
+
+from shops.models import Product
+
+from .models import ProductRecommendation, Review, UserRecommendation, Wishlist
+from .querycache import bump_recommendations_version
+from .similarity import top_neighbours
+
+DEFAULT_TOP_K = 12
+DEFAULT_CHUNK_SIZE = 1000
+READ_CHUNK_SIZE = 10000
+WRITE_BATCH_SIZE = 1000
+
+# A review counts as "cares about" from this rating up
+MIN_REVIEW_RATING = 3
+
+
+def interaction_pairs():
+    """(user_id, product_id) int64 array of saves and good reviews on active products."""
+    sources = (
+        Wishlist.objects.filter(product__is_active=True).values_list('user_id', 'product_id'),
+        Review.objects.filter(product__is_active=True, rating__gte=MIN_REVIEW_RATING)
+        .values_list('user_id', 'product_id'),
+    )
+    chunks, batch = [], []
+    for queryset in sources:
+        for row in queryset.iterator(chunk_size=READ_CHUNK_SIZE):
+            batch.append(row)
+            if len(batch) >= READ_CHUNK_SIZE:
+                chunks.append(np.array(batch, dtype=np.int64))
+                batch = []
+    if batch:
+        chunks.append(np.array(batch, dtype=np.int64))
+    if not chunks:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.concatenate(chunks)
+
+
+def interaction_matrix(pairs):
+    """Binary users x products CSR matrix plus the user and product ids of its rows/columns."""
+    user_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+    product_ids, cols = np.unique(pairs[:, 1], return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (rows, cols)),
+        shape=(len(user_ids), len(product_ids)),
+    )
+    matrix.sum_duplicates()
+    matrix.data[:] = 1  # Saved and reviewed counts once
+    return matrix, user_ids, product_ids
+
+
+def item_neighbours(matrix, top_k, chunk_size):
+    """Top-k cosine neighbours per product column: {column: (columns, scores)}."""
+    items = matrix.T.tocsr()
+    savers = np.diff(items.indptr).astype(np.float32)
+    savers[savers == 0] = 1
+    items = sparse.csr_matrix(sparse.diags(1 / np.sqrt(savers)) @ items)
+    return {
+        row: (columns, scores)
+        for row, columns, scores in top_neighbours(items, list(range(items.shape[0])), top_k, chunk_size)
+        if len(columns)
+    }
+
+
+def user_scores(matrix, neighbours, top_k, chunk_size):
+    """Yield (row, columns) of the best unsaved products for every user row."""
+    size = matrix.shape[1]
+    rows, cols, data = [], [], []
+    for item, (columns, scores) in neighbours.items():
+        rows.extend([item] * len(columns))
+        cols.extend(columns.tolist())
+        data.extend(scores.tolist())
+    similarity = sparse.csr_matrix((np.array(data, dtype=np.float32), (rows, cols)), shape=(size, size))
+
+    for start in range(0, matrix.shape[0], chunk_size):
+        chunk = matrix[start:start + chunk_size]
+        scores = (chunk @ similarity).tocsr()
+        for offset in range(chunk.shape[0]):
+            begin, end = scores.indptr[offset], scores.indptr[offset + 1]
+            columns, values = scores.indices[begin:end], scores.data[begin:end]
+            saved = chunk.indices[chunk.indptr[offset]:chunk.indptr[offset + 1]]
+            keep = ~np.isin(columns, saved)
+            columns, values = columns[keep], values[keep]
+            if not len(columns):
+                continue
+            if len(columns) > top_k:
+                best = np.argpartition(-values, top_k)[:top_k]
+                columns, values = columns[best], values[best]
+            yield start + offset, columns[np.argsort(-values, kind='stable')]
+
+
+def build_recommendations(top_k=DEFAULT_TOP_K, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Rebuild both recommendation tables. Returns (products, users) written."""
+    pairs = interaction_pairs()
+    if not len(pairs):
+        with transaction.atomic():
+            ProductRecommendation.objects.all().delete()
+            UserRecommendation.objects.all().delete()
+            transaction.on_commit(bump_recommendations_version)
+        return 0, 0
+
+    matrix, user_ids, product_ids = interaction_matrix(pairs)
+    neighbours = item_neighbours(matrix, top_k, chunk_size)
+
+    product_rows = (
+        ProductRecommendation(
+            product_id=int(product_ids[item]),
+            product_ids=product_ids[columns].tolist(),
+            scores=[round(float(s), 4) for s in scores],
+        )
+        for item, (columns, scores) in neighbours.items()
+    )
+    user_rows = (
+        UserRecommendation(user_id=int(user_ids[row]), product_ids=product_ids[columns].tolist())
+        for row, columns in user_scores(matrix, neighbours, top_k, chunk_size)
+    )
+
+    with transaction.atomic():
+        ProductRecommendation.objects.all().delete()
+        UserRecommendation.objects.all().delete()
+        product_count = _bulk_create(ProductRecommendation, product_rows)
+        user_count = _bulk_create(UserRecommendation, user_rows)
+        # Product pages cached by ETag show the old lists until this moves
+        transaction.on_commit(bump_recommendations_version)
+    return product_count, user_count
+
+
+def _bulk_create(model, objects):
+    written, batch = 0, []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= WRITE_BATCH_SIZE:
+            model.objects.bulk_create(batch)
+            written += len(batch)
+            batch = []
+    model.objects.bulk_create(batch)
+    return written + len(batch)
+
+
+def _active_in_order(product_ids, count):
+    if not product_ids:
+        return []
+    products = Product.objects.filter(id__in=product_ids, is_active=True).select_related('shop_owner').in_bulk()
+    return [products[pk] for pk in product_ids if pk in products][:count]
+
+
+def co_saved_products(product, count=4):
+    """Products most often saved by the customers who saved ``product``."""
+    product_ids = (
+        ProductRecommendation.objects.filter(pk=product.pk).values_list('product_ids', flat=True).first()
+        or []
+    )
+    return _active_in_order(product_ids[:count * 2], count)
+
+
+def recommended_products(user, count=4):
+    """Stored recommendations for ``user``."""
+    product_ids = (
+        UserRecommendation.objects.filter(pk=user.pk).values_list('product_ids', flat=True).first()
+        or []
+    )
+    return _active_in_order(product_ids[:count * 2], count)
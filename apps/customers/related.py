@@ -0,0 +1,48 @@
+"""
+Related products for the product page.
+
+Each shop's active product ids are cached as one list, so picking related
+products is a random sample from that list plus a primary-key lookup for the
+chosen few, instead of ``ORDER BY RANDOM()`` over the shop's whole catalog.
+The list is dropped from the cache whenever one of the shop's products is
+saved or deleted (customers.signals).
+"""
+import random
+
+from django.core.cache import cache
+
+from shops.models import Product
+
+SHOP_IDS_TIMEOUT = 60 * 60
+
+
+def _shop_key(shop_id):
+    return f'related:shop:{shop_id}'
+
+
+def shop_product_ids(shop_id):
+    """Ids of the shop's active products, from cache when possible."""
+    key = _shop_key(shop_id)
+    product_ids = cache.get(key)
+    if product_ids is None:
+        product_ids = list(
+            Product.objects.filter(shop_owner_id=shop_id, is_active=True).values_list('id', flat=True)
+        )
+        cache.set(key, product_ids, SHOP_IDS_TIMEOUT)
+    return product_ids
+
+
+def invalidate_shop(shop_id):
+    cache.delete(_shop_key(shop_id))
+
+
+def related_products(product, count=4):
+    """Up to ``count`` random active products from the same shop."""
+    product_ids = shop_product_ids(product.shop_owner_id)
+    # One extra so the product itself can be dropped from the sample
+    sample = random.sample(product_ids, min(count + 1, len(product_ids)))
+    chosen = [pk for pk in sample if pk != product.pk][:count]
+    if not chosen:
+        return []
+    products = Product.objects.filter(id__in=chosen, is_active=True).in_bulk()
+    return [products[pk] for pk in chosen if pk in products]
@@ -0,0 +1,72 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from accounts.models import ShopOwnerProfile
+from shops.models import Product
+from shops.signals import product_states_changed, products_bulk_changed
+from .alerts import record_alerts
+from .facets import facet_index
+from .models import Review, Wishlist
+from .querycache import bump_catalog_version, bump_wishlist_version
+from .ratings import apply_rating_change
+from .related import invalidate_shop
+
+
+# Cache versions move only once the write has committed: a bump before that
+# would let a concurrent reader cache the old rows under the new version
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    facet_index.update_product(instance)
+    transaction.on_commit(lambda: invalidate_shop(instance.shop_owner_id))
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    facet_index.remove_product(instance.pk)
+    transaction.on_commit(lambda: invalidate_shop(instance.shop_owner_id))
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=ShopOwnerProfile)
+def shop_saved(sender, instance, **kwargs):
+    facet_index.update_shop(instance)
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_delete, sender=ShopOwnerProfile)
+def shop_deleted(sender, instance, **kwargs):
+    transaction.on_commit(bump_catalog_version)
+
+
+# Ratings are applied by ratings.save_review, in the same transaction as the review
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, **kwargs):
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    apply_rating_change(instance.product_id, removed=instance.rating)
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Wishlist)
+@receiver(post_delete, sender=Wishlist)
+def wishlist_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: bump_wishlist_version(instance.user_id))
+
+
+@receiver(products_bulk_changed)
+def products_bulk_updated(sender, shop_id, **kwargs):
+    # Sent once the bulk write has committed
+    facet_index.clear()
+    invalidate_shop(shop_id)
+    bump_catalog_version()
+
+
+@receiver(product_states_changed)
+def product_states_updated(sender, changes, **kwargs):
+    # Only alert rows here; emails go out from the send_wishlist_alerts command
+    record_alerts(changes)
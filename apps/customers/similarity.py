@@ -0,0 +1,181 @@
+"""
+Content-based "similar products".
+
+``build_similarities`` turns every product's name, description and extra
+note into a TF-IDF vector (sparse SciPy matrix, rows L2-normalised), takes
+cosine similarities in row chunks and stores each product's top-k
+neighbours in ProductSimilarity. It is run by the ``build_similar_products``
+management command; the product page only reads one ProductSimilarity row.
+
+An incremental run recomputes neighbours for products added or edited
+since their row was written and for every product whose stored list names
+one of them, so a product that drops out of a list is replaced. The changed
+products are then linked into the lists of the other products they are now
+most similar to. The TF-IDF matrix is still built over the whole catalog,
+as the IDF weights depend on all of it; only the similarity products and
+the writes are limited to the affected rows.
+"""
+import numpy as np
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from scipy import sparse
+
+from shops.models import Product
+from shops.search import tokenize
+
+from .models import ProductSimilarity
+from .querycache import bump_recommendations_version
+
+DEFAULT_TOP_K = 8
+DEFAULT_CHUNK_SIZE = 512
+MIN_SCORE = 0.05
+
+# Name words count this many times, so "rice" in a name beats a mention in a description
+NAME_WEIGHT = 2
+
+
+def product_terms(name, description, extra_note):
+    words = tokenize(name) * NAME_WEIGHT + tokenize(description or '') + tokenize(extra_note or '')
+    return [word for word in words if len(word) > 1 and not word.isdigit()]
+
+
+def tfidf_matrix(documents):
+    """L2-normalised sublinear TF-IDF CSR matrix for a list of term lists."""
+    vocabulary = {}
+    rows, cols, counts = [], [], []
+    for row, terms in enumerate(documents):
+        tally = {}
+        for term in terms:
+            col = vocabulary.setdefault(term, len(vocabulary))
+            tally[col] = tally.get(col, 0) + 1
+        rows.extend([row] * len(tally))
+        cols.extend(tally.keys())
+        counts.extend(tally.values())
+
+    shape = (len(documents), max(len(vocabulary), 1))
+    matrix = sparse.csr_matrix(
+        (np.array(counts, dtype=np.float32), (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64))),
+        shape=shape,
+    )
+    matrix.data = 1 + np.log(matrix.data)
+
+    document_frequency = np.bincount(matrix.indices, minlength=shape[1])
+    idf = np.log((1 + shape[0]) / (1 + document_frequency)) + 1
+    matrix = matrix @ sparse.diags(idf.astype(np.float32))
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.csr_matrix(sparse.diags(1 / norms) @ matrix)
+
+
+def top_neighbours(matrix, rows, top_k, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield (row, neighbour_rows, scores) for ``rows``, best first."""
+    transposed = matrix.T.tocsc()
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        similarities = (matrix[chunk] @ transposed).tocsr()
+        for offset, row in enumerate(chunk):
+            begin, end = similarities.indptr[offset], similarities.indptr[offset + 1]
+            columns = similarities.indices[begin:end]
+            scores = similarities.data[begin:end]
+            keep = (columns != row) & (scores >= MIN_SCORE)
+            columns, scores = columns[keep], scores[keep]
+            if len(scores) > top_k:
+                best = np.argpartition(-scores, top_k)[:top_k]
+                columns, scores = columns[best], scores[best]
+            order = np.argsort(-scores, kind='stable')
+            yield row, columns[order], scores[order]
+
+
+def build_similarities(full=False, top_k=DEFAULT_TOP_K, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Recompute stored neighbours. Returns the number of products updated."""
+    catalog = list(
+        Product.objects.filter(is_active=True)
+        .values_list('id', 'name', 'description', 'extra_note')
+        .iterator(chunk_size=2000)
+    )
+    if not catalog:
+        return 0
+    ids = np.array([row[0] for row in catalog], dtype=np.int64)
+    matrix = tfidf_matrix([product_terms(*row[1:]) for row in catalog])
+
+    stale = set()
+    if full or not ProductSimilarity.objects.exists():
+        targets = list(range(len(ids)))
+    else:
+        stale = set(
+            Product.objects.filter(is_active=True)
+            .filter(Q(similarity__isnull=True) | Q(updated_at__gt=F('similarity__updated_at')))
+            .values_list('id', flat=True)
+        )
+        # Lists that name a changed product are recomputed too, as it may have dropped out
+        recompute = set(stale)
+        if stale:
+            stored = ProductSimilarity.objects.values_list('pk', 'similar_ids').iterator(chunk_size=2000)
+            recompute.update(pk for pk, similar_ids in stored if stale.intersection(similar_ids))
+        targets = [row for row, pk in enumerate(ids.tolist()) if pk in recompute]
+    if not targets:
+        return 0
+
+    computed = {}
+    for row, neighbours, scores in top_neighbours(matrix, targets, top_k, chunk_size):
+        computed[int(ids[row])] = (ids[neighbours].tolist(), [round(float(s), 4) for s in scores])
+
+    with transaction.atomic():
+        if full or len(targets) == len(ids):
+            ProductSimilarity.objects.all().delete()
+            ProductSimilarity.objects.bulk_create(
+                [ProductSimilarity(product_id=pk, similar_ids=n, scores=s) for pk, (n, s) in computed.items()],
+                batch_size=1000,
+            )
+        else:
+            _store_incremental(computed, stale, top_k)
+        # Product pages cached by ETag show the old lists until this moves
+        transaction.on_commit(bump_recommendations_version)
+    return len(computed)
+
+
+def _store_incremental(computed, changed, top_k):
+    # Similarity is symmetric: a changed product may now belong in the lists
+    # of the products it is closest to. Those lists did not name it before
+    # (they would have been recomputed), so it only has to be merged in
+    changed = {pk: computed[pk] for pk in changed if pk in computed}
+    merged = {}
+    affected = {pk for neighbours, _ in changed.values() for pk in neighbours} - set(computed)
+    existing = ProductSimilarity.objects.in_bulk(list(affected | set(computed)))
+    for pk in affected:
+        record = existing.get(pk)
+        if record is None:
+            continue
+        pairs = dict(zip(record.similar_ids, record.scores))
+        for changed_pk, (neighbours, scores) in changed.items():
+            if pk in neighbours:
+                pairs[changed_pk] = scores[neighbours.index(pk)]
+        best = sorted(pairs.items(), key=lambda item: -item[1])[:top_k]
+        merged[pk] = ([p for p, _ in best], [s for _, s in best])
+
+    updates, creates = [], []
+    for pk, (neighbours, scores) in list(computed.items()) + list(merged.items()):
+        record = existing.get(pk)
+        if record is None:
+            creates.append(ProductSimilarity(product_id=pk, similar_ids=neighbours, scores=scores))
+        else:
+            record.similar_ids, record.scores = neighbours, scores
+            updates.append(record)
+    # bulk_update skips auto_now, so the refreshed rows are touched explicitly
+    ProductSimilarity.objects.bulk_create(creates, batch_size=1000)
+    ProductSimilarity.objects.bulk_update(updates, ['similar_ids', 'scores'], batch_size=1000)
+    ProductSimilarity.objects.filter(pk__in=list(computed)).update(updated_at=timezone.now())
+
+
+def similar_products(product, count=4):
+    """Stored neighbours of ``product`` that are still active."""
+    similar_ids = (
+        ProductSimilarity.objects.filter(pk=product.pk).values_list('similar_ids', flat=True).first()
+        or []
+    )[:count * 2]
+    if not similar_ids:
+        return []
+    products = Product.objects.filter(id__in=similar_ids, is_active=True).select_related('shop_owner').in_bulk()
+    return [products[pk] for pk in similar_ids if pk in products][:count]
@@ -1,3 +1,51 @@
+import json
+
 from django.test import TestCase
+from django.urls import reverse
+
+from accounts.models import ShopOwnerProfile, User
+from shops.models import Product
+from .models import Wishlist
+
+
+class WishlistBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user(
+            email='owner@example.com', password='pw', first_name='O', last_name='W',
+            is_shop_owner=True, is_customer=False, is_approved=True,
+        )
+        shop = ShopOwnerProfile.objects.create(
+            user=owner, shop_name='Shop', address='a', phone='+233241234567', city='Accra', is_approved=True,
+        )
+        cls.product = Product.objects.create(shop_owner=shop, name='Rice', description='rice', price=10, stock=5)
+        cls.customer = User.objects.create_user(email='customer@example.com', password='pw', first_name='C', last_name='U')
+
+    def setUp(self):
+        self.client.force_login(self.customer)
+
+    def toggle(self, times):
+        operations = [{'product_id': self.product.pk, 'action': 'toggle'}] * times
+        return self.client.post(
+            reverse('customers:wishlist_batch'),
+            json.dumps({'operations': operations}),
+            content_type='application/json',
+        )
+
+    def assertSaved(self, response, saved):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['wishlist'], {str(self.product.pk): saved})
+        self.assertEqual(Wishlist.objects.filter(user=self.customer, product=self.product).exists(), saved)
+
+    def test_one_toggle_adds(self):
+        self.assertSaved(self.toggle(1), True)
+
+    def test_two_toggles_cancel_out(self):
+        self.assertSaved(self.toggle(2), False)
+
+    def test_three_toggles_add(self):
+        self.assertSaved(self.toggle(3), True)
 
-# Create your tests here.
+    def test_toggles_resolve_against_stored_wishlist(self):
+        Wishlist.objects.create(user=self.customer, product=self.product)
+        self.assertSaved(self.toggle(3), False)
@@ -10,9 +10,12 @@ urlpatterns = [
     path('wishlist/', views.wishlist_view, name='wishlist'),
     path('wishlist/add/', views.add_wishlist, name='add_wishlist'),
     path('wishlist/remove/', views.remove_wishlist, name='remove_wishlist'),
+    path('wishlist/batch/', views.wishlist_batch, name='wishlist_batch'),
     path('product/<int:pk>/', views.product_detail, name='product_detail'),
     path('product/<int:pk>/review/', views.submit_review, name='submit_review'),
+    path('product/<int:pk>/reviews/', views.product_reviews, name='product_reviews'),
     path('search-suggestions/', views.search_suggestions, name='search_suggestions'),
+    path('search-cache-stats/', views.search_cache_stats, name='search_cache_stats'),
 
     path('profile/', views.profile, name='profile'),
     path('profile/edit/', views.edit_profile, name='edit_profile'),
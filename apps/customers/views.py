@@ -6,10 +6,11 @@ from django.http import HttpResponseForbidden, JsonResponse
 from django.contrib import messages
 from django.core.paginator import Paginator
 from django.urls import reverse
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import condition, require_POST
 from django.db.models import Q
 from django.http import JsonResponse
 from django.db.models.functions import Lower
+from django.core.cache import cache
 
 from accounts.models import User, CustomerProfile  # Import CustomerProfile
 from accounts.forms import EditUserForm, EditCustomerForm  # Import the forms
@@ -17,9 +18,29 @@ from accounts.forms import EditUserForm, EditCustomerForm  # Import the forms
 from accounts.models import User     # assuming shop owners are in User model
 from django.db.models import Count
 from shops.models import Product
+from shops.search import search_product_ids, products_in_order, tokenize
+from shops.autocomplete import prefix_index
+from shops.spelling import spelling_corrector
+from shops.geo import parse_location, nearby_product_ids
+from shops import leaderboard
 from .models import Wishlist
 from .models import Wishlist, Review
 from .forms import ReviewForm
+from .pagination import keyset_paginate, sequence_paginate
+from .facets import FACET_KEYS, facet_index, parse_selection
+from .querycache import result_cache
+from .related import related_products
+from .similarity import similar_products
+from .recommendations import co_saved_products, recommended_products
+from .ratings import save_review
+from .wishlist import WishlistOperationError, apply_operations, wishlisted
+from .conditional import product_detail_etag
+
+# How long the catalog size shown in cursor mode may be stale (seconds)
+APPROXIMATE_COUNT_TIMEOUT = 300
+# Reviews per page of the reviews API, and the most a client may ask for
+REVIEWS_PER_PAGE = 10
+MAX_REVIEWS_PER_PAGE = 50
 
 @login_required
 def profile(request):
@@ -118,82 +139,180 @@ def customers_dashboard(request):
     if not request.user.is_customer:
         return redirect('accounts:login')
 
-    total_products = Product.objects.count()
-    total_shops = User.objects.filter(is_shop_owner=True).count()
+    # Cached counters and the stats-table leaderboard (shops.leaderboard), so
+    # this page costs the same however many shops and products there are
+    total_products = leaderboard.counter('products')
+    total_shops = leaderboard.counter('shops')
 
-    # Recently added products (limit to 5)
-    recent_products = Product.objects.order_by('-created_at')[:5]
+    # Recently added products (limit to 5); ids follow creation order and use the primary key index
+    recent_products = Product.objects.select_related('shop_owner', 'rating').order_by('-pk')[:5]
 
     # Shop owners with most products
-    top_shops = (
-    User.objects.filter(is_shop_owner=True)
-    .annotate(product_count=Count('shopownerprofile__products'))
-    .order_by('-product_count')[:5]
-    )
+    top_shops = leaderboard.top_shops(count=5)
+
+    # Precomputed from wishlists and reviews by build_recommendations
+    recommended = recommended_products(request.user, count=6)
 
     context = {
         'total_products': total_products,
         'total_shops': total_shops,
         'recent_products': recent_products,
         'top_shops': top_shops,
+        'recommended_products': recommended,
     }
     return render(request, 'customers/dashboard.html', context)
 
 
 
+def _catalog_results(search_query, location, selection):
+    # Ranked product ids when searching or sorting by distance, else None
+    product_ids = None
+
+    # Add search functionality
+    corrected_query = None
+    if search_query:
+        # Ranked ids come from the full-text index; only the page is loaded
+        product_ids = search_product_ids(search_query)
+        if not product_ids:
+            # Retry a misspelled search in the same request
+            corrected_query = spelling_corrector.correct(search_query)
+            if corrected_query:
+                product_ids = search_product_ids(corrected_query)
+
+    # Filter and order by shop distance
+    shop_distances = {}
+    if location:
+        product_ids, shop_distances = nearby_product_ids(*location, product_ids=product_ids)
+
+    # Facet counts come from the in-memory facet index. It only narrows the
+    # results when a facet is picked: it lags writes made in other processes,
+    # so otherwise the search/distance ids above (already active-only) stand
+    facet_ids, facet_counts = facet_index.filter_and_count(selection, candidate_ids=product_ids)
+    if selection:
+        product_ids = facet_ids
+
+    return {
+        'product_ids': product_ids,
+        'corrected_query': corrected_query,
+        'shop_distances': shop_distances,
+        'facet_counts': facet_counts,
+    }
+
+
 def product_list(request):
     # Start with base queryset
     qs = Product.objects.filter(is_active=True).select_related('shop_owner')
     
-    # Add search functionality
+    # Opt-in cursor mode (?cursor=), used for deep pages and infinite scroll
+    cursor_mode = 'cursor' in request.GET
+
     search_query = request.GET.get('q', '').strip()
-    if search_query:
-        qs = qs.filter(
-            Q(name__icontains=search_query) | 
-            Q(description__icontains=search_query) |
-            Q(shop_owner__shop_name__icontains=search_query)
+
+    # "Near me": ?lat=&lng=&radius=, rounded to ~100 m so nearby customers share cache entries
+    location = parse_location(request.GET)
+    if location:
+        lat, lng, radius = location
+        location = (round(lat, 3), round(lng, 3), round(radius, 1))
+
+    selection = parse_selection(request.GET)
+
+    # The ranked id list for this search is cached per catalog version; every
+    # page of the same search is served from one entry
+    cache_key = (
+        ' '.join(tokenize(search_query)),
+        location,
+        tuple(sorted((key, tuple(sorted(value)) if isinstance(value, set) else value)
+                     for key, value in selection.items())),
+    )
+    results = result_cache.get_or_compute(
+        cache_key, lambda: _catalog_results(search_query, location, selection)
+    )
+    product_ids = results['product_ids']
+    corrected_query = results['corrected_query']
+    shop_distances = results['shop_distances']
+    facet_counts = results['facet_counts']
+
+    if product_ids is not None:
+        if cursor_mode:
+            paginator = None
+            page_obj = sequence_paginate(product_ids, request.GET.get('cursor'), 12)
+        else:
+            paginator = Paginator(product_ids, 12)
+            page_obj = paginator.get_page(request.GET.get('page'))
+        products = products_in_order(qs, page_obj.object_list)
+    elif cursor_mode:
+        # Keyset pagination: seeks on id instead of COUNT(*) + OFFSET
+        paginator = None
+        page_obj = keyset_paginate(qs, ('-id',), request.GET.get('cursor'), 12)
+        page_obj.count = cache.get_or_set(
+            'catalog:active_product_count', qs.count, APPROXIMATE_COUNT_TIMEOUT
         )
-    
-    # Pagination
-    paginator = Paginator(qs.order_by('-id'), 12)
-    page_obj = paginator.get_page(request.GET.get('page'))
+        products = page_obj.object_list
+    else:
+        # Pagination
+        paginator = Paginator(qs.order_by('-id'), 12)
+        page_obj = paginator.get_page(request.GET.get('page'))
+        products = page_obj.object_list
 
-    # Get wishlist product IDs if user is authenticated
-    wishlist_product_ids = []
-    if request.user.is_authenticated:
-        wishlist_product_ids = Wishlist.objects.filter(
-            user=request.user
-        ).values_list('product_id', flat=True)
+    for product in products:
+        product.distance_km = shop_distances.get(product.shop_owner_id)
+
+    # Query string for pager links, without the page/cursor itself
+    base_query = request.GET.copy()
+    base_query.pop('page', None)
+    base_query.pop('cursor', None)
+
+    # Which of the cards on this page are in the customer's wishlist
+    wishlist_product_ids = wishlisted(request.user, [product.id for product in products])
 
     return render(request, 'customers/products.html', {
-        'products': page_obj.object_list,
+        'products': products,
         'page_obj': page_obj,
         'paginator': paginator,
-        'wishlist_product_ids': list(wishlist_product_ids),
+        'wishlist_product_ids': wishlist_product_ids,
         'search_query': search_query,  # Pass search query back to template
+        'corrected_query': corrected_query,
+        'cursor_mode': cursor_mode,
+        'elided_page_range': (
+            paginator.get_elided_page_range(page_obj.number) if paginator else []
+        ),
+        'location': location,
+        'facets': facet_index.options(selection, facet_counts, request.GET),
+        'facet_params': [(key, value) for key in FACET_KEYS for value in request.GET.getlist(key)],
+        'base_query': base_query.urlencode(),
     })
 
 
 def search_suggestions(request):
     query = request.GET.get('q', '')[:50]  # Limit length for safety
-    suggestions = []
+    data = {'suggestions': [], 'corrected_query': None}
     
     if query and len(query) >= 2:
-        products = Product.objects.filter(
-            Q(name__icontains=query) | 
-            Q(shop_owner__shop_name__icontains=query),
-            is_active=True
-        ).order_by(Lower('name'))[:5]  # Get top 5 matches
-        
-        shop_names = Product.objects.filter(
-            shop_owner__shop_name__icontains=query,
-            is_active=True
-        ).values_list('shop_owner__shop_name', flat=True).distinct()[:2]
-        
-        suggestions = list(products.values_list('name', flat=True))
-        suggestions.extend(f"Shop: {name}" for name in shop_names)
+        data = result_cache.get_or_compute(
+            ('suggestions', ' '.join(tokenize(query))), lambda: _suggestions(query)
+        )
     
-    return JsonResponse({'suggestions': suggestions})
+    return JsonResponse(data)
+
+
+def _suggestions(query):
+    # Answered from the in-process prefix index, no database round trip
+    suggestions = prefix_index.product_names(query, limit=5)  # Get top 5 matches
+    suggestions.extend(f"Shop: {name}" for name in prefix_index.shop_names(query, limit=2))
+
+    corrected_query = None
+    if not suggestions:
+        corrected_query = spelling_corrector.correct(query)
+        if corrected_query:
+            suggestions = prefix_index.product_names(corrected_query, limit=5)
+    return {'suggestions': suggestions, 'corrected_query': corrected_query}
+
+
+@login_required
+def search_cache_stats(request):
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    return JsonResponse(result_cache.stats())
 
 
 @login_required
@@ -202,33 +321,85 @@ def submit_review(request, pk):
     if request.method == 'POST':
         form = ReviewForm(request.POST)
         if form.is_valid():
-            review, created = Review.objects.update_or_create(
-                user=request.user,
-                product=product,
-                defaults=form.cleaned_data
-            )
+            # Updates the product's stored rating aggregates in the same transaction
+            save_review(request.user, product, form.cleaned_data['rating'], form.cleaned_data['comment'])
     return redirect('customers:product_detail', pk=pk)
 
 @login_required
+def product_reviews(request, pk):
+    # Count comes from the stored aggregates, so no COUNT(*) over the reviews
+    product = get_object_or_404(Product.objects.select_related('rating').only('id', 'rating'), pk=pk, is_active=True)
+    rating = getattr(product, 'rating', None)
+
+    reviews = Review.objects.filter(product_id=pk).select_related('user').only(
+        'id', 'rating', 'comment', 'created_at',
+        'user__first_name', 'user__last_name', 'user__profile_picture',
+    )
+    stars = request.GET.get('rating', '')
+    count = rating.count if rating else 0
+    if stars:
+        try:
+            stars = int(stars)
+        except ValueError:
+            stars = None
+        if stars not in range(1, 6):
+            return JsonResponse({'error': 'rating must be 1 to 5'}, status=400)
+        reviews = reviews.filter(rating=stars)
+        count = getattr(rating, f'stars_{stars}', 0)
+
+    per_page = request.GET.get('per_page', '')
+    per_page = min(int(per_page), MAX_REVIEWS_PER_PAGE) if per_page.isdigit() and int(per_page) > 0 else REVIEWS_PER_PAGE
+
+    # Seeks on (created_at, id), the Review.Meta ordering made unique
+    page = keyset_paginate(reviews, ('-created_at', '-id'), request.GET.get('cursor'), per_page)
+    return JsonResponse({
+        'reviews': [
+            {
+                'id': review.id,
+                'rating': review.rating,
+                'comment': review.comment,
+                'created_at': review.created_at.isoformat(),
+                'user_name': review.user.get_full_name(),
+                'profile_picture': review.user.profile_picture.url if review.user.profile_picture else None,
+            }
+            for review in page
+        ],
+        'count': count,
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    })
+
+
+@login_required
+@condition(etag_func=product_detail_etag)
 def product_detail(request, pk):
-    product = get_object_or_404(Product, pk=pk, is_active=True)
+    product = get_object_or_404(Product.objects.select_related('shop_owner', 'rating'), pk=pk, is_active=True)
+    # Count and stars come from the stored aggregates; only the shown reviews are loaded
+    rating = getattr(product, 'rating', None)
+    recent_reviews = product.reviews.select_related('user')[:3]
 
-    # Check if current product is in wishlist
-    in_wishlist = Wishlist.objects.filter(user=request.user, product=product).exists()
+    # Get 4 related products (same shop owner), sampled from the cached id list
+    related = related_products(product, count=4)
 
-    # Get 4 related products (same shop owner)
-    related_products = Product.objects.filter(
-        shop_owner=product.shop_owner
-    ).exclude(pk=product.pk).order_by('?')[:4]
+    # Content-based neighbours precomputed by the build_similar_products command
+    similar = [p for p in similar_products(product, count=8) if p not in related][:4]
 
-    # Get wishlist product IDs (to highlight related product hearts)
-    wishlist_product_ids = Wishlist.objects.filter(user=request.user).values_list('product_id', flat=True)
+    # "Customers who saved this also saved", precomputed by build_recommendations
+    co_saved = [p for p in co_saved_products(product, count=8) if p not in related and p not in similar][:4]
+
+    # Wishlist hearts for this product and every card below it, in one lookup
+    shown = [product, *related, *similar, *co_saved]
+    wishlist_product_ids = wishlisted(request.user, [p.id for p in shown])
 
     return render(request, 'customers/product_detail.html', {
         'product': product,
-        'in_wishlist': in_wishlist,
-        'related_products': related_products,
-        'wishlist_product_ids': list(wishlist_product_ids),  # for related products
+        'rating': rating,
+        'recent_reviews': recent_reviews,
+        'in_wishlist': product.id in wishlist_product_ids,
+        'related_products': related,
+        'similar_products': similar,
+        'co_saved_products': co_saved,
+        'wishlist_product_ids': wishlist_product_ids,  # for related products
     })
 
 
@@ -267,6 +438,24 @@ def add_wishlist(request):
 
 
 
+@require_POST
+def wishlist_batch(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Login required'}, status=403)
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    try:
+        state = apply_operations(request.user, data.get('operations'))
+    except WishlistOperationError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'wishlist': {str(pk): saved for pk, saved in state.items()}})
+
+
 @login_required
 def remove_wishlist(request, pk):
     product = get_object_or_404(Product, pk=pk)
@@ -0,0 +1,123 @@
+"""
+Wishlist membership for the product cards being rendered.
+
+``wishlisted(user, product_ids)`` answers "which of these products has the
+customer saved" for one page of cards. Answers are cached per customer as
+a ``{product_id: saved}`` map under a key that includes their wishlist
+version (customers.querycache), which every wishlist change bumps, so a
+change makes the old map unreachable at once. Only ids the map has not
+seen yet are looked up, with one ``IN`` query, so the cost follows the
+page size rather than the size of the wishlist.
+
+``apply_operations`` applies a batch of heart clicks (for example ones
+queued while offline) in a single transaction and request.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+from shops.models import Product
+from .models import Wishlist
+from .querycache import bump_wishlist_version, wishlist_version
+
+MEMBERSHIP_KEY = 'wishlist:members:{user_id}:{version}'
+MEMBERSHIP_TIMEOUT = 60 * 60
+MAX_KNOWN_IDS = 5000  # Past this the map starts over, so cache entries stay small
+MAX_OPERATIONS = 200
+
+
+def wishlisted(user, product_ids):
+    """The subset of ``product_ids`` in ``user``'s wishlist."""
+    product_ids = set(product_ids)
+    if not product_ids or not user.is_authenticated:
+        return set()
+
+    key = MEMBERSHIP_KEY.format(user_id=user.pk, version=wishlist_version(user.pk))
+    known = cache.get(key) or {}
+    missing = product_ids - known.keys()
+    if missing:
+        saved = set(
+            Wishlist.objects.filter(user=user, product_id__in=missing)
+            .values_list('product_id', flat=True)
+        )
+        if len(known) + len(missing) > MAX_KNOWN_IDS:
+            known = {}
+        known.update((pk, pk in saved) for pk in missing)
+        cache.set(key, known, timeout=MEMBERSHIP_TIMEOUT)
+    return {pk for pk in product_ids if known[pk]}
+
+
+class WishlistOperationError(ValueError):
+    pass
+
+
+def collapse_operations(operations):
+    """
+    The final action per product from an ordered list of
+    ``{"product_id": ..., "action": "add" | "remove" | "toggle"}``. A product
+    whose only actions are toggles keeps one toggle, which apply_operations
+    resolves against the stored wishlist, after an odd number of them, and
+    is left out after an even number, as they cancel out.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise WishlistOperationError('operations must be a non-empty list')
+    if len(operations) > MAX_OPERATIONS:
+        raise WishlistOperationError(f'At most {MAX_OPERATIONS} operations per request')
+
+    final = {}
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise WishlistOperationError('Each operation needs a product_id and an action')
+        product_id, action = operation.get('product_id'), operation.get('action')
+        if isinstance(product_id, bool) or not isinstance(product_id, int):
+            raise WishlistOperationError('product_id must be a product id')
+        if action not in ('add', 'remove', 'toggle'):
+            raise WishlistOperationError(f'Unknown action "{action}"')
+        if action == 'toggle' and product_id in final:
+            if final[product_id] == 'toggle':
+                # Two toggles cancel out; a third one finds the product absent again
+                del final[product_id]
+                continue
+            # A toggle after a known action flips it
+            action = 'remove' if final[product_id] == 'add' else 'add'
+        final[product_id] = action
+    return final
+
+
+def apply_operations(user, operations):
+    """
+    Apply a batch of wishlist changes in one transaction: one conflict-ignoring
+    bulk insert for the adds and one delete for the removes. Returns the new
+    ``{product_id: saved}`` state of every product named.
+    """
+    final = collapse_operations(operations)
+    # Products whose toggles cancelled out are still reported
+    named = {operation['product_id'] for operation in operations}
+    with transaction.atomic():
+        toggles = [pk for pk, action in final.items() if action == 'toggle']
+        if toggles:
+            saved = set(
+                Wishlist.objects.filter(user=user, product_id__in=toggles)
+                .values_list('product_id', flat=True)
+            )
+            final.update((pk, 'remove' if pk in saved else 'add') for pk in toggles)
+
+        adds = [pk for pk, action in final.items() if action == 'add']
+        removes = [pk for pk, action in final.items() if action == 'remove']
+        if adds:
+            # Only active products can be saved; unknown ids are left out
+            active = Product.objects.filter(pk__in=adds, is_active=True).values_list('pk', flat=True)
+            Wishlist.objects.bulk_create(
+                [Wishlist(user=user, product_id=pk) for pk in active],
+                ignore_conflicts=True,
+            )
+        if removes:
+            Wishlist.objects.filter(user=user, product_id__in=removes).delete()
+
+        state = set(
+            Wishlist.objects.filter(user=user, product_id__in=named)
+            .values_list('product_id', flat=True)
+        )
+        # bulk_create sends no signals; bump after commit so no reader caches
+        # the old membership under the new version
+        transaction.on_commit(lambda: bump_wishlist_version(user.pk))
+    return {pk: pk in state for pk in named}
@@ -0,0 +1,76 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from jobs import queue
+
+SCHEDULE_EVERY = 60  # Seconds between checks for stale and periodic jobs
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (emails, image resizing, rollups, alerts) until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Jobs run at the same time (default 4)')
+        parser.add_argument('--processes', action='store_true',
+                            help='Use a process pool instead of threads, for CPU-heavy jobs')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to wait between checks when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Run the jobs that are due, then exit (for cron)')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        poll = options['poll_interval']
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        if options['processes']:
+            # Spawned children set Django up themselves instead of sharing
+            # the parent's database connection
+            pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=django.setup)
+        else:
+            pool = ThreadPoolExecutor(workers, thread_name_prefix='job')
+
+        stopping = []
+        def stop(signum, frame):
+            stopping.append(signum)
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        self.stdout.write(f'Worker {worker_id} running {workers} at a time')
+        running, done, next_schedule = {}, 0, 0
+        try:
+            while not stopping:
+                close_old_connections()
+                if time.monotonic() >= next_schedule:
+                    queue.requeue_stale()
+                    queue.schedule_periodic()
+                    next_schedule = time.monotonic() + SCHEDULE_EVERY
+
+                free = workers - len(running)
+                if free:
+                    for pk in queue.claim(worker_id, free):
+                        running[pool.submit(queue.run_job, pk)] = pk
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(poll)
+                    continue
+
+                finished, _ = wait(running, timeout=poll, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    pk = running.pop(future)
+                    done += 1
+                    if future.exception():
+                        # run_job records job errors itself; this is the pool failing
+                        self.stderr.write(f'Job {pk} could not run: {future.exception()}')
+        finally:
+            # Only as many jobs as workers are claimed, so all of them are running: let them finish
+            pool.shutdown(wait=True)
+        self.stdout.write(self.style.SUCCESS(f'Ran {done} jobs'))
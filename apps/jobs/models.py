@@ -0,0 +1,38 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    # Higher runs first
+    HIGH = 10
+    NORMAL = 0
+    LOW = -10
+
+    name = models.CharField(max_length=200)  # Dotted path of the function to call
+    kwargs = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(default=NORMAL)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The workers' "what next" query
+            models.Index(fields=['status', '-priority', 'run_at'], name='job_next_idx'),
+            models.Index(fields=['name', 'status'], name='job_name_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
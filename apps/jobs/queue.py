@@ -0,0 +1,146 @@
+"""
+A job queue kept in the database, so no broker has to run next to the site.
+
+``enqueue('accounts.tasks.send_verification_email', email=..., code=...)``
+inserts a Job row naming a function by its dotted path, with JSON keyword
+arguments. It is written in the caller's transaction, so a request that
+rolls back leaves no job behind. ``manage.py run_workers`` claims due jobs,
+highest priority first, and calls them in a thread or process pool.
+
+A claim is a conditional ``UPDATE ... WHERE status = 'queued'``, so two
+workers never take the same job on any database. A job that raises is
+queued again with an exponentially growing delay until it has used up
+``max_attempts``, then left as failed with its traceback for the admin.
+Jobs whose worker died are given back after JOB_LOCK_TIMEOUT.
+
+Periodic work (stock rollups, wishlist alerts, clearing old sign-ups) is
+scheduled by the workers from PERIODIC_JOBS: each name is queued again
+its interval after its previous run finished.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F, Max
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETRY_DELAY = 30  # Seconds before the first retry; doubles per attempt
+MAX_RETRY_DELAY = 60 * 60
+DEFAULT_LOCK_TIMEOUT = 60 * 15
+DEFAULT_KEEP_DAYS = 7
+# Dotted path: seconds between runs
+DEFAULT_PERIODIC_JOBS = {
+    'shops.history.rollup_history': 60 * 60,
+    'customers.alerts.send_alerts': 60 * 10,
+    'accounts.tasks.cleanup_pending_users': 60 * 60,
+    'jobs.queue.prune_jobs': 60 * 60 * 24,
+}
+
+
+def enqueue(name, /, priority=Job.NORMAL, run_at=None, max_attempts=5, **kwargs):
+    """
+    Queue a call of the function at dotted path ``name`` with ``kwargs``,
+    which must be JSON-serializable.
+    """
+    import_string(name)  # A typo fails here, in the request, not later in a worker
+    return Job.objects.create(
+        name=name,
+        kwargs=kwargs,
+        priority=priority,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts,
+    )
+
+
+def retry_delay(attempts):
+    base = getattr(settings, 'JOB_RETRY_DELAY', DEFAULT_RETRY_DELAY)
+    delay = min(base * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+    # Jitter so jobs that failed together do not all retry together
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim(worker, limit):
+    """Mark up to ``limit`` due jobs as running by ``worker``. Returns their ids."""
+    now = timezone.now()
+    candidates = list(
+        Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+        .order_by('-priority', 'run_at', 'id')
+        .values_list('pk', flat=True)[:limit * 2]
+    )
+    claimed = []
+    for pk in candidates:
+        taken = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_at=now, locked_by=worker, attempts=F('attempts') + 1,
+        )
+        if taken:  # Otherwise another worker got it first
+            claimed.append(pk)
+            if len(claimed) == limit:
+                break
+    return claimed
+
+
+def run_job(pk):
+    """Call a claimed job and record how it went. Runs inside a pool worker."""
+    close_old_connections()
+    try:
+        job = Job.objects.get(pk=pk)
+        try:
+            import_string(job.name)(**job.kwargs)
+        except Exception:
+            _failed(job, traceback.format_exc())
+        else:
+            Job.objects.filter(pk=pk).update(status=Job.DONE, finished_at=timezone.now(), last_error='')
+    finally:
+        # Pool threads would otherwise each keep a connection open
+        connection.close()
+
+
+def _failed(job, error):
+    now = timezone.now()
+    if job.attempts >= job.max_attempts:
+        logger.error('Job %s %s failed for good after %s attempts', job.pk, job.name, job.attempts)
+        changes = {'status': Job.FAILED, 'finished_at': now}
+    else:
+        logger.warning('Job %s %s failed (attempt %s), retrying', job.pk, job.name, job.attempts)
+        changes = {'status': Job.QUEUED, 'run_at': now + retry_delay(job.attempts)}
+    Job.objects.filter(pk=job.pk).update(last_error=error, locked_by='', **changes)
+
+
+def requeue_stale():
+    """Give back jobs whose worker stopped mid-run; ones out of attempts fail."""
+    timeout = getattr(settings, 'JOB_LOCK_TIMEOUT', DEFAULT_LOCK_TIMEOUT)
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=timezone.now() - timedelta(seconds=timeout))
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished_at=timezone.now(), last_error='The worker running this job stopped',
+    )
+    return stale.update(status=Job.QUEUED, locked_by='')
+
+
+def schedule_periodic():
+    """Queue each periodic job that is not already queued or running."""
+    periodic = getattr(settings, 'PERIODIC_JOBS', DEFAULT_PERIODIC_JOBS)
+    for name, interval in periodic.items():
+        if Job.objects.filter(name=name, status__in=[Job.QUEUED, Job.RUNNING]).exists():
+            continue
+        last = (
+            Job.objects.filter(name=name, status__in=[Job.DONE, Job.FAILED])
+            .aggregate(last=Max('finished_at'))['last']
+        )
+        run_at = last + timedelta(seconds=interval) if last else None
+        enqueue(name, priority=Job.LOW, run_at=run_at)
+
+
+def prune_jobs(days=None):
+    """Delete finished jobs older than JOB_KEEP_DAYS. Failed ones stay for the admin."""
+    days = days or getattr(settings, 'JOB_KEEP_DAYS', DEFAULT_KEEP_DAYS)
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = Job.objects.filter(status=Job.DONE, finished_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,184 @@
+"""
+In-process prefix index for the search-box autocomplete endpoints.
+
+Product and shop names are split into word suffixes ("jasmine rice" is stored
+under "jasmine rice" and "rice") and kept in sorted lists, so a prefix lookup
+is a bisect plus a short scan. The index is built on first use and updated
+from the Product/ShopOwnerProfile signals in shops.signals. Writes that skip
+signals (queryset.update, bulk_create) or happen in another worker process
+are picked up when the index is rebuilt, in the background, after
+AUTOCOMPLETE_INDEX_MAX_AGE seconds (shops.indexes).
+"""
+import heapq
+import time
+from bisect import bisect_left, insort
+
+from accounts.models import ShopOwnerProfile
+
+from .indexes import InMemoryIndex
+from .models import Product
+from .search import tokenize
+
+
+def word_suffixes(text):
+    words = tokenize(text)
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+class PrefixIndex(InMemoryIndex):
+    max_age_setting = 'AUTOCOMPLETE_INDEX_MAX_AGE'
+
+    def __init__(self):
+        super().__init__()
+        self._product_keys = []   # sorted (suffix, product_id)
+        self._shop_keys = []      # sorted (suffix, shop_id)
+        self._products = {}       # product_id -> (name, shop_id, is_active)
+        self._shops = {}          # shop_id -> shop_name
+        self._active_counts = {}  # shop_id -> number of active products
+
+    # Building
+
+    def build(self):
+        shops = dict(ShopOwnerProfile.objects.values_list('id', 'shop_name'))
+        products = {
+            pk: (name, shop_id, is_active)
+            for pk, name, shop_id, is_active in Product.objects.values_list(
+                'id', 'name', 'shop_owner_id', 'is_active'
+            ).iterator(chunk_size=2000)
+        }
+        product_keys = sorted(
+            (suffix, pk)
+            for pk, (name, _, _) in products.items()
+            for suffix in word_suffixes(name)
+        )
+        shop_keys = sorted(
+            (suffix, pk)
+            for pk, shop_name in shops.items()
+            for suffix in word_suffixes(shop_name)
+        )
+        active_counts = {}
+        for name, shop_id, is_active in products.values():
+            if is_active:
+                active_counts[shop_id] = active_counts.get(shop_id, 0) + 1
+
+        with self._lock:
+            self._products = products
+            self._shops = shops
+            self._product_keys = product_keys
+            self._shop_keys = shop_keys
+            self._active_counts = active_counts
+            self._built_at = time.monotonic()
+
+    # Incremental updates
+
+    def add_product(self, pk, name, shop_id, is_active):
+        with self._lock:
+            if self._built_at is None:
+                return
+            self.remove_product(pk)
+            self._products[pk] = (name, shop_id, is_active)
+            for suffix in word_suffixes(name):
+                insort(self._product_keys, (suffix, pk))
+            if is_active:
+                self._active_counts[shop_id] = self._active_counts.get(shop_id, 0) + 1
+
+    def remove_product(self, pk):
+        with self._lock:
+            if self._built_at is None or pk not in self._products:
+                return
+            name, shop_id, is_active = self._products.pop(pk)
+            for suffix in word_suffixes(name):
+                _remove_key(self._product_keys, (suffix, pk))
+            if is_active:
+                self._active_counts[shop_id] -= 1
+
+    def add_shop(self, pk, shop_name):
+        with self._lock:
+            if self._built_at is None:
+                return
+            self.remove_shop(pk)
+            self._shops[pk] = shop_name
+            for suffix in word_suffixes(shop_name):
+                insort(self._shop_keys, (suffix, pk))
+
+    def remove_shop(self, pk):
+        with self._lock:
+            if self._built_at is None or pk not in self._shops:
+                return
+            for suffix in word_suffixes(self._shops.pop(pk)):
+                _remove_key(self._shop_keys, (suffix, pk))
+
+    # Lookups
+
+    def product_names(self, query, limit=5, shop_id=None, active_only=True):
+        """Names of products with a word starting with each query word."""
+        self.ensure_built()
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        with self._lock:
+            matches = []
+            seen = set()
+            for _, pk in _scan(self._product_keys, tokens[0]):
+                if pk in seen:
+                    continue
+                seen.add(pk)
+                name, product_shop_id, is_active = self._products[pk]
+                if active_only and not is_active:
+                    continue
+                if shop_id is not None and product_shop_id != shop_id:
+                    continue
+                if len(tokens) > 1 and not _matches_all(name, tokens[1:]):
+                    continue
+                matches.append(name)
+
+        # Names starting with the query first, then alphabetical
+        lowered = query.strip().lower()
+        ranked = heapq.nsmallest(
+            limit,
+            matches,
+            key=lambda name: (not name.lower().startswith(lowered), name.lower()),
+        )
+        return list(dict.fromkeys(ranked))
+
+    def shop_names(self, query, limit=2):
+        """Names of shops with at least one active product."""
+        self.ensure_built()
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        names = []
+        with self._lock:
+            for _, pk in _scan(self._shop_keys, ' '.join(tokens)):
+                if self._active_counts.get(pk, 0) <= 0:
+                    continue
+                shop_name = self._shops[pk]
+                if shop_name not in names:
+                    names.append(shop_name)
+                    if len(names) == limit:
+                        break
+        return names
+
+
+def _scan(keys, prefix):
+    start = bisect_left(keys, (prefix,))
+    for i in range(start, len(keys)):
+        if not keys[i][0].startswith(prefix):
+            break
+        yield keys[i]
+
+
+def _matches_all(text, tokens):
+    words = tokenize(text)
+    return all(any(word.startswith(token) for word in words) for token in tokens)
+
+
+def _remove_key(keys, key):
+    i = bisect_left(keys, key)
+    if i < len(keys) and keys[i] == key:
+        del keys[i]
+
+
+prefix_index = PrefixIndex()
@@ -0,0 +1,164 @@
+"""
+Bulk operations on a shop owner's products.
+
+A request names a selection, either explicit ``ids`` or a ``filter`` over
+the owner's products (e.g. ``{"stock_lte": 5}``), and one action, which
+runs as a single set-based statement:
+
+    activate / deactivate      UPDATE ... SET is_active = ...
+    set_stock / add_stock      UPDATE ... SET stock = value / stock + value
+    set_price                  UPDATE ... SET price = value
+    adjust_price_percent       UPDATE ... SET price = ROUND(price * (1 + value / 100), 2)
+    delete                     DELETE (through Django's collector, so wishlists
+                               and reviews of the products go with them)
+
+The shop's stats row is refreshed in the same transaction, and the new
+state of every product touched is appended to the stock/price history
+(shops.history). Stock/price/active changes are also sent as
+``product_states_changed`` for wishlist alerts. ``products_bulk_changed``,
+which clears the search indexes and caches, is sent once the transaction
+has committed.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Greatest, Round
+from django.utils import timezone
+
+from .history import STATE_FIELDS, record_queryset, record_rows
+from .models import Product
+from .signals import product_states_changed, products_bulk_changed
+from .stats import defer_stats, refresh_shop_stats
+
+# Selection filter -> (lookup, model field used to parse the value)
+FILTERS = {
+    'stock_lte': ('stock__lte', 'stock'),
+    'stock_gte': ('stock__gte', 'stock'),
+    'price_lte': ('price__lte', 'price'),
+    'price_gte': ('price__gte', 'price'),
+    'is_active': ('is_active', 'is_active'),
+    'name_contains': ('name__icontains', 'name'),
+}
+
+ACTIONS = ('activate', 'deactivate', 'set_stock', 'add_stock', 'set_price', 'adjust_price_percent', 'delete')
+MAX_PRICE_CHANGE_PERCENT = 1000
+
+
+class BulkOperationError(ValueError):
+    pass
+
+
+def select_products(shop, ids=None, filters=None):
+    """The owner's products matching explicit ``ids`` or ``filters``."""
+    queryset = Product.objects.filter(shop_owner=shop)
+    if ids is not None:
+        if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+            raise BulkOperationError('ids must be a list of product ids')
+        return queryset.filter(pk__in=ids)
+
+    if not isinstance(filters, dict) or not filters:
+        raise BulkOperationError('Give either ids or a filter')
+    lookups = {}
+    for key, value in filters.items():
+        if key not in FILTERS:
+            raise BulkOperationError(f'Unknown filter "{key}"')
+        lookup, field_name = FILTERS[key]
+        # None would reach the query as e.g. stock__lte=None, which Django rejects
+        if not isinstance(value, (str, int, float, bool)):
+            raise BulkOperationError(f'Invalid value for filter "{key}"')
+        try:
+            lookups[lookup] = Product._meta.get_field(field_name).to_python(value)
+        except (ValidationError, TypeError, ValueError):
+            raise BulkOperationError(f'Invalid value for filter "{key}"')
+    return queryset.filter(**lookups)
+
+
+def apply_operation(shop, action, value=None, ids=None, filters=None):
+    """Run ``action`` over the selection. Returns the number of products changed."""
+    if action not in ACTIONS:
+        raise BulkOperationError(f'Unknown action "{action}"')
+    queryset = select_products(shop, ids, filters)
+
+    with transaction.atomic():
+        if action == 'delete':
+            record_queryset(queryset, deleted=True)
+            # Stats are recomputed once below instead of per deleted product
+            with defer_stats():
+                _, deleted = queryset.delete()
+            count = deleted.get(Product._meta.label, 0)
+        else:
+            changes = _changes(action, value)
+            before = {
+                pk: (stock, price, is_active)
+                for pk, _, stock, price, is_active in queryset.values_list(*STATE_FIELDS).iterator()
+            }
+            count = queryset.update(updated_at=timezone.now(), **changes)
+            # A filter may no longer match after the update (e.g. stock_lte with
+            # set_stock), so the touched rows are read back by id
+            after = list(Product.objects.filter(pk__in=before).values_list(*STATE_FIELDS))
+            record_rows(after)
+            changed = [
+                (pk, before[pk], (stock, price, is_active))
+                for pk, _, stock, price, is_active in after
+                if pk in before and before[pk] != (stock, price, is_active)
+            ]
+            if changed:
+                product_states_changed.send(sender=Product, changes=changed)
+        if count:
+            refresh_shop_stats(shop.pk)
+            # After commit, so the indexes and caches it clears are not refilled with
+            # the old rows
+            transaction.on_commit(lambda: products_bulk_changed.send(sender=Product, shop_id=shop.pk))
+    return count
+
+
+def _changes(action, value):
+    if action == 'activate':
+        return {'is_active': True}
+    if action == 'deactivate':
+        return {'is_active': False}
+    if action == 'set_stock':
+        return {'stock': _whole_number(value, minimum=0)}
+    if action == 'add_stock':
+        return {'stock': Greatest(F('stock') + _whole_number(value), 0)}
+    if action == 'set_price':
+        price = _decimal(value)
+        if price < 0:
+            raise BulkOperationError('Price cannot be negative')
+        try:
+            # max_digits/decimal_places, so an oversized price is a 400 and not a database error
+            price = Product._meta.get_field('price').clean(price, None)
+        except ValidationError as e:
+            raise BulkOperationError(e.messages[0])
+        return {'price': price}
+    percent = _decimal(value)
+    if not -100 < percent <= MAX_PRICE_CHANGE_PERCENT:
+        raise BulkOperationError(f'Price change must be above -100% and at most {MAX_PRICE_CHANGE_PERCENT}%')
+    factor = Value(1 + percent / 100, output_field=DecimalField())
+    return {'price': Round(F('price') * factor, 2, output_field=DecimalField(max_digits=10, decimal_places=2))}
+
+
+def _whole_number(value, minimum=None):
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise BulkOperationError('Value must be a whole number')
+    try:
+        number = int(value)
+    except ValueError:
+        raise BulkOperationError('Value must be a whole number')
+    if minimum is not None and number < minimum:
+        raise BulkOperationError(f'Value must be at least {minimum}')
+    return number
+
+
+def _decimal(value):
+    if isinstance(value, bool) or value is None:
+        raise BulkOperationError('Value must be a number')
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        raise BulkOperationError('Value must be a number')
+    if not number.is_finite():
+        raise BulkOperationError('Value must be a number')
+    return number
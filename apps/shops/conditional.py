@@ -0,0 +1,59 @@
+"""
+Validators for conditional GETs (``django.views.decorators.http.condition``).
+
+``condition`` runs these before the view, so a repeated request answered
+with 304 Not Modified costs one indexed lookup. The ETag and Last-Modified
+callables of one view share that lookup through ``request_memo``.
+"""
+from .models import Product, ShopStats
+
+
+def request_memo(request, name, compute):
+    """``compute()`` once per request, cached on the request under ``name``."""
+    attr = f'_conditional_{name}'
+    if not hasattr(request, attr):
+        setattr(request, attr, compute())
+    return getattr(request, attr)
+
+
+def _owned_product_updated_at(request, pk):
+    return request_memo(request, 'product', lambda: (
+        Product.objects.filter(pk=pk, shop_owner__user=request.user)
+        .values_list('updated_at', flat=True)
+        .first()
+    ))
+
+
+def product_etag(request, pk):
+    updated_at = _owned_product_updated_at(request, pk)
+    if updated_at is None:
+        return None
+    return f'"product-{pk}-{updated_at.timestamp():.6f}"'
+
+
+def product_last_modified(request, pk):
+    return _owned_product_updated_at(request, pk)
+
+
+def _dashboard_stats(request):
+    # Only the ?partial=true JSON is validated; the full page renders other data
+    if request.GET.get('partial') != 'true' or not request.user.is_shop_owner:
+        return None
+    return request_memo(request, 'shop_stats', lambda: (
+        ShopStats.objects.filter(shop__user=request.user)
+        .values_list('shop_id', 'version', 'updated_at')
+        .first()
+    ))
+
+
+def dashboard_etag(request):
+    stats = _dashboard_stats(request)
+    if stats is None:
+        return None
+    shop_id, version, _ = stats
+    return f'"shop-stats-{shop_id}-{version}"'
+
+
+def dashboard_last_modified(request):
+    stats = _dashboard_stats(request)
+    return stats[2] if stats else None
@@ -0,0 +1,109 @@
+"""
+Live stock counts for the shop dashboard (Server-Sent Events).
+
+A dashboard tab opens ``shops:dashboard_events`` with ``EventSource``. The
+async view (served by marketing/asgi.py) holds the connection open and
+waits on an in-process pub/sub: when a product write commits, shops.stats
+publishes the shop id and every subscriber for that shop re-reads its
+ShopStats row and sends only the counts that changed. An idle tab costs no
+queries between changes.
+
+The broker only sees writes made in the same process, so with several
+worker processes the stream also re-reads the row every
+SHOP_EVENTS_POLL_INTERVAL seconds (set it to None for a single process).
+Under WSGI the endpoint answers 204, which stops EventSource, and the page
+falls back to polling ``?partial=true``.
+"""
+import asyncio
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+DEFAULT_POLL_INTERVAL = 30
+HEARTBEAT_INTERVAL = 30  # Comment lines keep proxies from closing an idle stream
+
+
+class StatsBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # shop_id -> {(loop, queue)}
+
+    def subscribe(self, shop_id):
+        queue = asyncio.Queue(maxsize=1)
+        subscriber = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers.setdefault(shop_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, shop_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(shop_id)
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[shop_id]
+
+    def publish(self, shop_id):
+        """Wake every stream for ``shop_id``. Safe to call from any thread."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(shop_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_wake, queue)
+            except RuntimeError:
+                pass  # Loop already closed; the stream is going away
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+
+def _wake(queue):
+    # One pending wake-up is enough: the stream re-reads the whole row
+    if queue.empty():
+        queue.put_nowait(None)
+
+
+def format_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+async def stats_stream(shop_id, read_counts):
+    """
+    Yield SSE messages for ``shop_id``: all counts first, then only the
+    fields that changed. ``read_counts`` is a sync callable returning the
+    current counts dict.
+    """
+    poll_interval = getattr(settings, 'SHOP_EVENTS_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+    timeout = min(poll_interval or HEARTBEAT_INTERVAL, HEARTBEAT_INTERVAL)
+    read_counts = sync_to_async(read_counts)
+
+    subscriber = stats_broker.subscribe(shop_id)
+    queue = subscriber[1]
+    try:
+        sent = {}
+        since_read = 0
+        refresh = True
+        yield 'retry: 5000\n\n'
+        while True:
+            if refresh:
+                since_read = 0
+                counts = await read_counts()
+                changed = {key: value for key, value in counts.items() if sent.get(key) != value}
+                if changed:
+                    sent.update(changed)
+                    yield format_event('stats', changed)
+            try:
+                await asyncio.wait_for(queue.get(), timeout)
+                refresh = True
+            except asyncio.TimeoutError:
+                since_read += timeout
+                refresh = bool(poll_interval) and since_read >= poll_interval
+                yield ': keep-alive\n\n'
+    finally:
+        stats_broker.unsubscribe(shop_id, subscriber)
+
+
+stats_broker = StatsBroker()
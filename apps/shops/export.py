@@ -0,0 +1,104 @@
+"""
+Streaming product export (CSV or JSON Lines, optionally gzipped).
+
+Rows are read in primary-key order with ``values()`` and
+``.iterator(chunk_size=...)`` and encoded one at a time, so an export of
+any size holds about one chunk in memory and the first bytes go out as
+soon as the first chunk is read. ``after`` resumes an interrupted export
+from the last id received: every row carries its ``id``.
+
+The CSV columns start with the ones the importer (shops.importer) reads,
+so an export can be edited and imported back.
+"""
+import csv
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Product
+
+EXPORT_FIELDS = (
+    'id', 'name', 'description', 'price', 'stock', 'extra_note', 'is_active', 'image',
+    'shop_owner_id', 'shop_owner__shop_name', 'created_at', 'updated_at',
+)
+# Friendlier column names for the joined shop fields
+COLUMN_NAMES = {'shop_owner_id': 'shop_id', 'shop_owner__shop_name': 'shop_name'}
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+}
+DEFAULT_CHUNK_SIZE = 2000
+BUFFER_SIZE = 64 * 1024  # Bytes collected before each write/yield
+
+
+def export_rows(queryset=None, after=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Product rows as dicts in id order, starting after id ``after``."""
+    queryset = Product.objects.all() if queryset is None else queryset
+    if after:
+        queryset = queryset.filter(id__gt=after)
+    rows = queryset.order_by('id').values(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield {COLUMN_NAMES.get(key, key): value for key, value in row.items()}
+
+
+class _Line:
+    """File-like target for csv.writer that hands back what was written."""
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, header=True):
+    writer = csv.writer(_Line())
+    if header:
+        yield writer.writerow([COLUMN_NAMES.get(field, field) for field in EXPORT_FIELDS])
+    for row in rows:
+        yield writer.writerow(row.values())
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def encode(lines, export_format, header=True):
+    if export_format == 'csv':
+        return csv_lines(lines, header=header)
+    return jsonl_lines(lines)
+
+
+def buffered(lines, size=BUFFER_SIZE):
+    """Join text lines into UTF-8 chunks of about ``size`` bytes."""
+    parts, length = [], 0
+    for line in lines:
+        data = line.encode()
+        parts.append(data)
+        length += len(data)
+        if length >= size:
+            yield b''.join(parts)
+            parts, length = [], 0
+    if parts:
+        yield b''.join(parts)
+
+
+def gzipped(chunks):
+    """gzip-compress a stream of byte chunks, flushing after each so bytes keep flowing."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(queryset=None, export_format='csv', after=None, compress=False):
+    """Byte chunks of the whole export."""
+    # A resumed CSV export continues the same file, so it has no second header
+    lines = encode(export_rows(queryset, after=after), export_format, header=not after)
+    chunks = buffered(lines)
+    return gzipped(chunks) if compress else chunks
+
+
+def export_filename(base, export_format, compress=False):
+    name = f'{base}.{FORMATS[export_format][1]}'
+    return f'{name}.gz' if compress else name
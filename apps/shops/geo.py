@@ -0,0 +1,122 @@
+"""
+"Near me" product lookups.
+
+Candidate shops come from the ``shops_shop_rtree`` R*Tree index (see
+migration ``shops.0004_shop_rtree``) with a bounding-box query around the
+customer. Exact great-circle distances are then computed for all candidates
+at once with NumPy, and products are ordered by their shop's distance.
+"""
+import math
+
+import numpy as np
+from django.db import connection
+
+from accounts.models import ShopOwnerProfile
+
+from .models import Product
+from .search import virtual_table_ready
+
+RTREE_TABLE = 'shops_shop_rtree'
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+DEFAULT_RADIUS_KM = 10
+MAX_RADIUS_KM = 200
+
+
+def parse_location(params):
+    """Return (lat, lng, radius_km) from request parameters, or None."""
+    try:
+        lat = float(params['lat'])
+        lng = float(params['lng'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+
+    try:
+        radius = float(params.get('radius') or DEFAULT_RADIUS_KM)
+    except (TypeError, ValueError):
+        radius = DEFAULT_RADIUS_KM
+    radius = min(max(radius, 0.1), MAX_RADIUS_KM)
+    return lat, lng, radius
+
+
+def haversine_km(lat, lng, lats, lngs):
+    """Distances in km from (lat, lng) to every point in the ``lats``/``lngs`` arrays."""
+    lat1, lng1 = np.radians(lat), np.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def bounding_box(lat, lng, radius_km):
+    dlat = radius_km / KM_PER_DEGREE
+    dlng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    return lat - dlat, lat + dlat, lng - dlng, lng + dlng
+
+
+def rtree_available():
+    return virtual_table_ready(RTREE_TABLE)
+
+
+def shops_within(lat, lng, radius_km):
+    """Return {shop_id: distance_km} for shops within ``radius_km``."""
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+
+    shops = ShopOwnerProfile.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    if rtree_available():
+        candidate_ids = _rtree_candidates(min_lat, max_lat, min_lng, max_lng)
+        if not candidate_ids:
+            return {}
+        shops = shops.filter(id__in=candidate_ids)
+    else:
+        shops = shops.filter(
+            latitude__range=(min_lat, max_lat),
+            longitude__range=(min_lng, max_lng),
+        )
+
+    rows = list(shops.values_list('id', 'latitude', 'longitude'))
+    if not rows:
+        return {}
+    ids, lats, lngs = (np.array(column) for column in zip(*rows))
+    distances = haversine_km(lat, lng, lats.astype(float), lngs.astype(float))
+    inside = distances <= radius_km
+    return dict(zip(ids[inside].tolist(), distances[inside].tolist()))
+
+
+def nearby_product_ids(lat, lng, radius_km, product_ids=None):
+    """
+    Ids of active products from shops within ``radius_km``, nearest first
+    (newest first within a shop), plus the {shop_id: distance_km} map.
+    ``product_ids`` restricts the result, e.g. to full-text search matches.
+    """
+    shop_distances = shops_within(lat, lng, radius_km)
+    if not shop_distances:
+        return [], {}
+
+    products = Product.objects.filter(is_active=True, shop_owner_id__in=list(shop_distances))
+    if product_ids is not None:
+        products = products.filter(id__in=product_ids)
+    rows = list(products.values_list('id', 'shop_owner_id'))
+    if not rows:
+        return [], shop_distances
+
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    distances = np.fromiter((shop_distances[row[1]] for row in rows), dtype=float, count=len(rows))
+    order = np.lexsort((-ids, distances))
+    return ids[order].tolist(), shop_distances
+
+
+def _rtree_candidates(min_lat, max_lat, min_lng, max_lng):
+    sql = f"""
+        SELECT id FROM {RTREE_TABLE}
+        WHERE max_lat >= %s AND min_lat <= %s AND max_lng >= %s AND min_lng <= %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [min_lat, max_lat, min_lng, max_lng])
+        return [row[0] for row in cursor.fetchall()]
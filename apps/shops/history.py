@@ -0,0 +1,293 @@
+"""
+Stock and price history with hourly/daily rollups for the dashboard charts.
+
+Every change to a product's stock, price or active flag appends one
+ProductHistory row holding the product's new state (a deletion appends a
+row with ``is_deleted``). Single saves record through the product signals
+(shops.signals); bulk writes (shops.bulk, shops.importer) call
+``record_products``/``record_queryset`` themselves.
+
+``rollup_history`` (run hourly by the ``rollup_stock_history`` command)
+replays the rows of each complete hour since the shop's last rollup and
+writes one ShopStockRollup per hour, plus one per day once the day is
+over, with the shop's counts as they stood at the end of the bucket. The
+running totals restart from the last hourly rollup, plus each product's
+last state before it, which comes from the history table. To keep that
+read small, history older than STOCK_HISTORY_RETENTION_DAYS is compacted
+after each run down to one row per product still in the shop, so a run
+reads the history written since the previous one and at most that window
+plus one row per product. A shop rolled up again from scratch can
+therefore only be rebuilt correctly within that window. Hourly rollups
+older than STOCK_HOURLY_RETENTION_DAYS are pruned; daily ones are kept.
+
+The dashboard charts read rollups only, never the history table.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef, Sum
+from django.utils import timezone
+
+from .models import ProductHistory, ShopStockRollup
+from .stats import product_buckets
+
+HOUR = timedelta(hours=1)
+DEFAULT_HOURLY_RETENTION_DAYS = 30
+DEFAULT_HISTORY_RETENTION_DAYS = 30
+# Writes are stamped before their transaction commits; an hour is only
+# rolled up once this much later so slow transactions still land in it
+SETTLE_TIME = timedelta(minutes=5)
+BATCH_SIZE = 1000
+
+COUNT_FIELDS = ('total', 'active', 'in_stock', 'low_stock', 'out_of_stock')
+TOTAL_FIELDS = COUNT_FIELDS + ('stock_units', 'price_total')
+HISTORY_FIELDS = ('product_id', 'stock', 'price', 'is_active', 'is_deleted')
+
+
+def product_state(product):
+    """(stock, price, is_active) as stored, for comparing before/after a save."""
+    return int(product.stock), Decimal(str(product.price)), bool(product.is_active)
+
+
+def history_entry(product, deleted=False, shop_id=None, recorded_at=None):
+    stock, price, is_active = product_state(product)
+    return ProductHistory(
+        product_id=product.pk,
+        shop_id=shop_id or product.shop_owner_id,
+        stock=stock,
+        price=price,
+        is_active=is_active,
+        is_deleted=deleted,
+        recorded_at=recorded_at or timezone.now(),
+    )
+
+
+def record_products(products, deleted=False):
+    """Append the current state of the given Product instances."""
+    now = timezone.now()
+    ProductHistory.objects.bulk_create(
+        [history_entry(product, deleted, recorded_at=now) for product in products],
+        batch_size=BATCH_SIZE,
+    )
+
+
+STATE_FIELDS = ('id', 'shop_owner_id', 'stock', 'price', 'is_active')
+
+
+def record_queryset(queryset, deleted=False):
+    """Append the current state of every product in ``queryset``, read in batches."""
+    rows = queryset.order_by().values_list(*STATE_FIELDS)
+    record_rows(rows.iterator(chunk_size=BATCH_SIZE), deleted)
+
+
+def record_rows(rows, deleted=False):
+    """Append states given as (id, shop_owner_id, stock, price, is_active) tuples."""
+    now = timezone.now()
+    batch = []
+    for product_id, shop_id, stock, price, is_active in rows:
+        batch.append(ProductHistory(
+            product_id=product_id, shop_id=shop_id, stock=stock, price=price,
+            is_active=is_active, is_deleted=deleted, recorded_at=now,
+        ))
+        if len(batch) >= BATCH_SIZE:
+            ProductHistory.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        ProductHistory.objects.bulk_create(batch)
+
+
+def _floor_hour(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _contribution(stock, price, is_active, is_deleted):
+    """What one product in this state adds to the running totals."""
+    if is_deleted:
+        return {}
+    added = dict.fromkeys(product_buckets(is_active, stock), 1)
+    if is_active:
+        added['stock_units'] = stock
+        added['price_total'] = price
+    return added
+
+
+def _states_before(shop_id, moment):
+    """Each product's last recorded state before ``moment``."""
+    latest = (
+        ProductHistory.objects.filter(shop_id=shop_id, recorded_at__lt=moment)
+        .values('product_id').annotate(last_id=Max('id')).order_by()
+        .values('last_id')
+    )
+    rows = ProductHistory.objects.filter(id__in=latest).values_list(*HISTORY_FIELDS)
+    return {product_id: state for product_id, *state in rows.iterator(chunk_size=BATCH_SIZE)}
+
+
+def rollup_shop(shop_id, until):
+    """Roll up the shop's complete hours before ``until``. Returns the hours written."""
+    last = (
+        ShopStockRollup.objects.filter(shop_id=shop_id, period=ShopStockRollup.HOUR)
+        .order_by('-bucket_start').first()
+    )
+    if last:
+        start = last.bucket_start + HOUR
+        totals = {field: getattr(last, field) for field in TOTAL_FIELDS}
+        states = _states_before(shop_id, start)
+    else:
+        first = (
+            ProductHistory.objects.filter(shop_id=shop_id)
+            .order_by('recorded_at').values_list('recorded_at', flat=True).first()
+        )
+        if first is None:
+            return 0
+        start = _floor_hour(first)
+        totals = dict.fromkeys(TOTAL_FIELDS, 0)
+        states = {}
+    if start >= until:
+        return 0
+
+    day_start = start.replace(hour=0)
+    day_changes = 0
+    if start > day_start:
+        # Resuming mid-day: count the changes of the hours already rolled up
+        day_changes = ShopStockRollup.objects.filter(
+            shop_id=shop_id, period=ShopStockRollup.HOUR,
+            bucket_start__gte=day_start, bucket_start__lt=start,
+        ).aggregate(changes=Sum('changes'))['changes'] or 0
+
+    events = (
+        ProductHistory.objects.filter(shop_id=shop_id, recorded_at__gte=start, recorded_at__lt=until)
+        .order_by('recorded_at', 'id')
+        .values_list('recorded_at', *HISTORY_FIELDS)
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    rollups, hours = [], 0
+    bucket, changes = start, 0
+
+    def close_bucket():
+        nonlocal bucket, changes, day_changes, hours
+        rollups.append(ShopStockRollup(
+            shop_id=shop_id, period=ShopStockRollup.HOUR, bucket_start=bucket, changes=changes, **totals,
+        ))
+        day_changes += changes
+        if bucket.hour == 23:
+            rollups.append(ShopStockRollup(
+                shop_id=shop_id, period=ShopStockRollup.DAY, bucket_start=bucket.replace(hour=0),
+                changes=day_changes, **totals,
+            ))
+            day_changes = 0
+        if len(rollups) >= BATCH_SIZE:
+            _save_rollups(rollups)
+            rollups.clear()
+        bucket += HOUR
+        changes = 0
+        hours += 1
+
+    with transaction.atomic():
+        for recorded_at, product_id, *state in events:
+            while recorded_at >= bucket + HOUR:
+                close_bucket()
+            previous = states.get(product_id)
+            if previous:
+                for field, value in _contribution(*previous).items():
+                    totals[field] -= value
+            for field, value in _contribution(*state).items():
+                totals[field] += value
+            states[product_id] = state
+            changes += 1
+        while bucket < until:
+            close_bucket()
+        _save_rollups(rollups)
+    return hours
+
+
+def _save_rollups(rollups):
+    # Upsert, so a shop rolled up again from its first history row (e.g. after
+    # its hourly rows were deleted) overwrites the day rows it already has
+    ShopStockRollup.objects.bulk_create(
+        rollups,
+        update_conflicts=True,
+        unique_fields=['shop', 'period', 'bucket_start'],
+        update_fields=[*TOTAL_FIELDS, 'changes'],
+    )
+
+
+def rollup_history(until=None, shop_ids=None):
+    """Roll up every shop with history. Returns (shops rolled up, hourly rows written)."""
+    until = _floor_hour(until or timezone.now() - SETTLE_TIME)
+    if shop_ids is None:
+        shop_ids = ProductHistory.objects.values_list('shop_id', flat=True).distinct().order_by()
+    shop_ids = list(shop_ids)
+    shops = hours = 0
+    for shop_id in shop_ids:
+        written = rollup_shop(shop_id, until)
+        if written:
+            shops += 1
+            hours += written
+    prune_hourly_rollups(shop_ids)
+    compact_history(shop_ids, until)
+    return shops, hours
+
+
+def prune_hourly_rollups(shop_ids, now=None):
+    """Delete the shops' hourly rows older than STOCK_HOURLY_RETENTION_DAYS."""
+    days = getattr(settings, 'STOCK_HOURLY_RETENTION_DAYS', DEFAULT_HOURLY_RETENTION_DAYS)
+    cutoff = _floor_hour(now or timezone.now()) - timedelta(days=days)
+    deleted = 0
+    for shop_id in shop_ids:
+        hourly = ShopStockRollup.objects.filter(shop_id=shop_id, period=ShopStockRollup.HOUR)
+        # The latest hour is where the next rollup resumes, so it always stays
+        latest = hourly.order_by('-bucket_start').values_list('pk', flat=True).first()
+        count, _ = hourly.filter(bucket_start__lt=cutoff).exclude(pk=latest).delete()
+        deleted += count
+    return deleted
+
+
+def compact_history(shop_ids, until, now=None):
+    """
+    Delete the shops' history rows older than STOCK_HISTORY_RETENTION_DAYS
+    (and rolled up, i.e. before ``until``) that no rollup needs again: all
+    but each product's last row, and that row too once it is a deletion.
+    """
+    days = getattr(settings, 'STOCK_HISTORY_RETENTION_DAYS', DEFAULT_HISTORY_RETENTION_DAYS)
+    before = min(until, (now or timezone.now()) - timedelta(days=days))
+    deleted = 0
+    for shop_id in shop_ids:
+        old = ProductHistory.objects.filter(shop_id=shop_id, recorded_at__lt=before)
+        newer = old.filter(product_id=OuterRef('product_id'), id__gt=OuterRef('id'))
+        count, _ = old.filter(Exists(newer)).delete()
+        deleted += count
+        # What is left is each product's last old state; a deleted product's adds nothing
+        count, _ = old.filter(is_deleted=True).delete()
+        deleted += count
+    return deleted
+
+
+def stock_trend(shop_id, period, since):
+    """Rollups for the dashboard chart, oldest first."""
+    rows = (
+        ShopStockRollup.objects.filter(shop_id=shop_id, period=period, bucket_start__gte=since)
+        .order_by('bucket_start')
+        .values_list('bucket_start', 'in_stock', 'low_stock', 'out_of_stock', 'active', 'stock_units', 'price_total')
+    )
+    return [
+        {
+            'start': start.isoformat(),
+            'in_stock': in_stock,
+            'low_stock': low_stock,
+            'out_of_stock': out_of_stock,
+            'stock_units': units,
+            'average_price': round(float(price_total) / active, 2) if active else None,
+        }
+        for start, in_stock, low_stock, out_of_stock, active, units, price_total in rows
+    ]
+
+
+def dashboard_trend(shop):
+    """Last 48 hourly and 365 daily rollups: a couple of small indexed reads."""
+    now = timezone.now()
+    return {
+        'hourly': stock_trend(shop.pk, ShopStockRollup.HOUR, now - timedelta(hours=48)),
+        'daily': stock_trend(shop.pk, ShopStockRollup.DAY, now - timedelta(days=365)),
+    }
@@ -0,0 +1,174 @@
+"""
+Resized WebP and JPEG copies of uploaded product and profile images.
+
+Originals are kept as uploaded. ``build_derivatives`` writes fixed-width
+copies next to them under ``derivatives/<original name>/``, for example
+``derivatives/product_images/shoe.png/480.webp`` and ``480.jpg``, plus a
+small ``manifest.json`` listing the widths it made. Images are never
+scaled up, so a small upload only gets the widths it can fill.
+
+Templates ask for these through the ``images`` template tags
+(shops/templatetags/images.py), which read the manifest through the cache
+and fall back to the original file while no copies exist yet. Copies are
+made by a background job queued when a product or profile picture is saved
+(shops.signals), and by the ``build_image_derivatives`` command for files
+uploaded before this existed.
+"""
+import hashlib
+import json
+import logging
+import posixpath
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = {
+    'product': (240, 480, 960),
+    'profile': (48, 96, 192),
+}
+# Which kind of image lives in each upload directory
+UPLOAD_DIRS = {
+    'product_images': 'product',
+    'profile_pics': 'profile',
+}
+DERIVATIVES_DIR = 'derivatives'
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+MANIFEST_KEY = 'image:derivatives:{digest}'
+MANIFEST_TIMEOUT = 60 * 60 * 24
+MISSING_TIMEOUT = 60 * 5  # Copies may be built by another process meanwhile
+
+
+def derivative_name(name, width, fmt):
+    ext = 'webp' if fmt == 'webp' else 'jpg'
+    return posixpath.join(DERIVATIVES_DIR, name, f'{width}.{ext}')
+
+
+def _manifest_name(name):
+    return posixpath.join(DERIVATIVES_DIR, name, 'manifest.json')
+
+
+def _manifest_key(name):
+    return MANIFEST_KEY.format(digest=hashlib.md5(name.encode()).hexdigest())
+
+
+def available_widths(name):
+    """The widths built for the stored file ``name``, smallest first; () when none are."""
+    if not name:
+        return ()
+    key = _manifest_key(name)
+    widths = cache.get(key)
+    if widths is None:
+        widths = ()
+        manifest = _manifest_name(name)
+        try:
+            if default_storage.exists(manifest):
+                with default_storage.open(manifest) as f:
+                    widths = tuple(json.load(f)['widths'])
+        except (OSError, ValueError, KeyError):
+            logger.warning('Unreadable image manifest for %s', name)
+        cache.set(key, widths, timeout=MANIFEST_TIMEOUT if widths else MISSING_TIMEOUT)
+    return widths
+
+
+def _flatten(image):
+    """RGB copy of ``image``, with any transparency laid on white for JPEG."""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _save(name, image, fmt):
+    buffer = BytesIO()
+    if fmt == 'webp':
+        image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+    else:
+        image.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    # Storage renames clashing files instead of replacing them
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def build_derivatives(name, kind, force=False):
+    """
+    Write the WebP and JPEG copies of stored file ``name`` for the widths of
+    ``kind``. Returns the widths built, or () when the file is missing or not
+    an image. Skips files that already have copies unless ``force``.
+    """
+    if not name:
+        return ()
+    if not force:
+        widths = available_widths(name)
+        if widths:
+            return widths
+
+    try:
+        with default_storage.open(name) as f:
+            with Image.open(f) as original:
+                original.seek(0)  # First frame of animated images
+                # Let JPEGs decode at a reduced scale that still covers the largest width
+                largest = max(WIDTHS[kind])
+                original.draft('RGB', (largest, largest))
+                image = _flatten(ImageOps.exif_transpose(original))
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+        logger.warning('Cannot build derivatives for %s: %s', name, e)
+        return ()
+
+    widths = [w for w in WIDTHS[kind] if w <= image.width] or [image.width]
+    for width in widths:
+        resized = image
+        if width < image.width:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+        _save(derivative_name(name, width, 'webp'), resized, 'webp')
+        _save(derivative_name(name, width, 'jpeg'), resized, 'jpeg')
+
+    # The manifest goes last: while it is missing, pages use the original
+    manifest = _manifest_name(name)
+    if default_storage.exists(manifest):
+        default_storage.delete(manifest)
+    default_storage.save(manifest, ContentFile(json.dumps({'widths': widths}).encode()))
+    cache.set(_manifest_key(name), tuple(widths), timeout=MANIFEST_TIMEOUT)
+    return tuple(widths)
+
+
+def _srcset(name, widths, fmt):
+    return ', '.join(f'{default_storage.url(derivative_name(name, width, fmt))} {width}w' for width in widths)
+
+
+def _pick(widths, width):
+    return next((w for w in widths if w >= width), widths[-1])
+
+
+def thumbnail_url(name, width, fmt='jpeg'):
+    """URL of the smallest copy at least ``width`` wide, or of the original while none are built."""
+    widths = available_widths(name)
+    if not widths:
+        return default_storage.url(name) if name else ''
+    return default_storage.url(derivative_name(name, _pick(widths, width), fmt))
+
+
+def variants(name, width):
+    """
+    What a ``<picture>`` needs for ``name``: ``src`` (the JPEG copy for
+    ``width``, or the original while none are built) and the JPEG and WebP
+    ``srcset`` values, which are '' while none are built.
+    """
+    widths = available_widths(name)
+    if not widths:
+        return {'src': default_storage.url(name) if name else '', 'srcset': '', 'webp_srcset': ''}
+    return {
+        'src': default_storage.url(derivative_name(name, _pick(widths, width), 'jpeg')),
+        'srcset': _srcset(name, widths, 'jpeg'),
+        'webp_srcset': _srcset(name, widths, 'webp'),
+    }
@@ -0,0 +1,248 @@
+"""
+Bulk product import for shop owners (CSV or XLSX).
+
+The file is read one row at a time and handled in chunks of
+PRODUCT_IMPORT_CHUNK_SIZE rows: each row is validated with the ProductForm
+rules, existing products are found with one query per chunk, and the
+chunk is written with ``bulk_create``/``bulk_update`` in its own
+transaction. Rows that fail validation are skipped and written to the
+error report as they happen, so memory use depends on the chunk size, not
+on the file size.
+
+Columns are the ProductForm field names: ``name``, ``description``,
+``price``, ``stock``, ``extra_note``, ``is_active`` and ``image``. A row
+updates the shop's product with the same ``id`` column or, failing that,
+the same name (case-insensitive); otherwise it creates one. On updates,
+columns missing from the file keep the product's current values. The
+columns the form requires (name, description, price, stock) must be present.
+``image`` is a path to a file already in media storage; it is required for
+new products and left unchanged on updates when blank, as is a blank
+``is_active`` (new products default to active).
+
+Bulk writes skip model signals, so after each chunk the shop's stats row
+is refreshed in the chunk's transaction, ``products_bulk_changed`` is sent
+once it commits to clear the search indexes and caches, and products whose
+stock, price or active flag changed are appended to the stock/price
+history and sent as ``product_states_changed``.
+"""
+import copy
+import csv
+import io
+import itertools
+
+from django import forms
+from django.conf import settings
+from django.forms.models import model_to_dict
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .forms import ProductForm
+from .history import product_state, record_products
+from .models import Product
+from .signals import product_states_changed, products_bulk_changed
+from .stats import refresh_shop_stats
+
+DEFAULT_CHUNK_SIZE = 500
+IMPORT_FIELDS = ('name', 'description', 'price', 'stock', 'extra_note', 'is_active')
+UPDATE_FIELDS = IMPORT_FIELDS + ('image', 'updated_at')
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'active'}
+
+
+class ProductImportError(Exception):
+    """The file as a whole cannot be imported (bad format or header)."""
+
+
+class ProductImportForm(ProductForm):
+    """ProductForm rules, with the image given as a stored file path."""
+    image = forms.CharField(required=False)
+
+    class Meta(ProductForm.Meta):
+        fields = list(IMPORT_FIELDS)
+
+    def clean_image(self):
+        path = (self.cleaned_data.get('image') or '').strip()
+        if not path:
+            if not self.instance.image:
+                raise forms.ValidationError('An image path is required for new products')
+            return self.instance.image.name
+        if not default_storage.exists(path):
+            raise forms.ValidationError(f'Image "{path}" was not found in media storage')
+        return path
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+
+    def as_dict(self):
+        return {'rows': self.rows, 'created': self.created, 'updated': self.updated, 'failed': self.failed}
+
+
+def iter_csv_rows(file):
+    """Yield (row_number, {column: value}) from a binary CSV file."""
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        reader = csv.DictReader(text)
+        _check_header(reader.fieldnames or [])
+        for row in reader:
+            yield reader.line_num, {key: (value or '') for key, value in row.items() if key}
+    except UnicodeDecodeError:
+        raise ProductImportError('The CSV file must be UTF-8 encoded')
+    finally:
+        text.detach()
+
+
+def iter_xlsx_rows(file):
+    """Yield (row_number, {column: value}) from the first sheet of an XLSX file."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ProductImportError('XLSX import needs the openpyxl package')
+
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except Exception:
+        raise ProductImportError('The file is not a valid XLSX workbook')
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else '' for cell in next(rows, ())]
+        _check_header(header)
+        for number, values in enumerate(rows, start=2):
+            if all(value is None for value in values):
+                continue
+            yield number, {key: _cell_text(value) for key, value in zip(header, values) if key}
+    finally:
+        workbook.close()
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))  # Whole-number cells, e.g. stock 10.0
+    return str(value)
+
+
+def _check_header(columns):
+    required = {name for name, field in ProductImportForm.base_fields.items() if field.required}
+    missing = required - {column.strip() for column in columns}
+    if missing:
+        raise ProductImportError(f'Missing column(s): {", ".join(sorted(missing))}')
+
+
+def iter_rows(file, filename):
+    if filename.lower().endswith('.xlsx'):
+        return iter_xlsx_rows(file)
+    if filename.lower().endswith('.csv'):
+        return iter_csv_rows(file)
+    raise ProductImportError('Upload a .csv or .xlsx file')
+
+
+def iter_import(shop, rows, error_writer=None, chunk_size=None):
+    """
+    Import ``rows`` (from iter_rows) into ``shop``, yielding the running
+    ImportResult after each chunk is committed. Failed rows go to
+    ``error_writer`` (a csv.writer) as (row, field, message).
+    """
+    chunk_size = chunk_size or getattr(settings, 'PRODUCT_IMPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    result = ImportResult()
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            break
+        _import_chunk(shop, chunk, result, error_writer)
+        yield result
+
+
+def import_products(shop, rows, error_writer=None, chunk_size=None, progress=None):
+    """Run iter_import to the end; ``progress`` is called after every chunk."""
+    result = ImportResult()
+    for result in iter_import(shop, rows, error_writer, chunk_size):
+        if progress:
+            progress(result)
+    return result
+
+
+def _import_chunk(shop, chunk, result, error_writer):
+    existing_by_id, existing_by_name = _existing_products(shop, chunk)
+    creates, updates = {}, {}
+    states_before = {}
+    now = timezone.now()
+
+    for number, row in chunk:
+        result.rows += 1
+        given = {field: row[field].strip() for field in IMPORT_FIELDS + ('image',) if field in row}
+        if given.get('is_active'):
+            given['is_active'] = given['is_active'].lower() in TRUE_VALUES
+        else:
+            given.pop('is_active', None)
+        pending = existing_by_id.get(row.get('id', '').strip()) or existing_by_name.get(given.get('name', '').lower())
+        # Start from the stored values so columns the file leaves out are kept
+        data = model_to_dict(pending, fields=IMPORT_FIELDS) if pending is not None else {'is_active': True}
+        data.update(given)
+        if pending is not None and pending.pk:
+            states_before.setdefault(pending.pk, product_state(pending))
+
+        # Validation writes the row's values onto the instance, so it runs on a copy: a
+        # failing row must not change a product an earlier row of the chunk already queued
+        form = ProductImportForm(data, instance=copy.copy(pending) if pending is not None else None)
+        if not form.is_valid():
+            result.failed += 1
+            if error_writer is not None:
+                for field, errors in form.errors.items():
+                    for message in errors:
+                        error_writer.writerow([number, field, message])
+            continue
+
+        product = form.save(commit=False)
+        if pending is not None:
+            for field in IMPORT_FIELDS:
+                setattr(pending, field, getattr(product, field))
+            product = pending
+        product.image = form.cleaned_data['image']
+        if product.pk:
+            product.updated_at = now  # bulk_update does not apply auto_now
+            updates[product.pk] = product
+        else:
+            product.shop_owner = shop
+            creates[id(product)] = product
+            # Later rows with the same name update this one instead of duplicating it
+            existing_by_name[product.name.lower()] = product
+
+    with transaction.atomic():
+        Product.objects.bulk_create(creates.values())
+        Product.objects.bulk_update(updates.values(), UPDATE_FIELDS)
+        changed = [
+            (pk, states_before[pk], product_state(p))
+            for pk, p in updates.items() if product_state(p) != states_before[pk]
+        ]
+        record_products([*creates.values(), *(updates[pk] for pk, _, _ in changed)])
+        refresh_shop_stats(shop.pk)
+        # After commit, so the indexes and caches it clears are not refilled with
+        # the old rows
+        transaction.on_commit(lambda: products_bulk_changed.send(sender=Product, shop_id=shop.pk))
+        if changed:
+            product_states_changed.send(sender=Product, changes=changed)
+    result.created += len(creates)
+    result.updated += len(updates)
+
+
+def _existing_products(shop, chunk):
+    ids = {row.get('id', '').strip() for _, row in chunk}
+    ids = [int(pk) for pk in ids if pk.isdigit()]
+    names = {row.get('name', '').strip().lower() for _, row in chunk} - {''}
+
+    products = Product.objects.filter(shop_owner=shop).annotate(lower_name=Lower('name'))
+    by_id = {str(p.pk): p for p in products.filter(pk__in=ids)} if ids else {}
+    by_name = {}
+    if names:
+        for product in products.filter(lower_name__in=names).order_by('-id'):
+            # Lowest id wins for duplicate names; rows matched by id share the same instance
+            by_name[product.lower_name] = by_id.get(str(product.pk), product)
+    return by_id, by_name
@@ -0,0 +1,65 @@
+"""
+Rebuild scheduling shared by the in-process indexes (autocomplete, spelling,
+catalog facets).
+
+The first lookup in a process builds the index while other threads wait
+for it. After that, an index older than its max age, or one marked stale by
+``clear()``, is rebuilt in a background thread while lookups keep using the
+current copy. A lock held for the whole rebuild, with the age checked again
+under it, means only one rebuild runs at a time.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_AGE = 300
+
+
+class InMemoryIndex:
+    max_age_setting = None  # Name of the setting holding the max age in seconds
+
+    def __init__(self):
+        self._lock = threading.RLock()     # Guards the index data
+        self._build_lock = threading.Lock()  # Held by whoever is rebuilding
+        self._built_at = None
+        self._stale = False
+
+    def build(self):
+        raise NotImplementedError
+
+    def _needs_rebuild(self):
+        max_age = getattr(settings, self.max_age_setting, DEFAULT_MAX_AGE)
+        return self._stale or time.monotonic() - self._built_at > max_age
+
+    def ensure_built(self):
+        if self._built_at is None:
+            with self._build_lock:
+                if self._built_at is None:  # Another thread may have built it meanwhile
+                    self._stale = False
+                    self.build()
+        elif self._needs_rebuild() and self._build_lock.acquire(blocking=False):
+            if not self._needs_rebuild():  # Rebuilt while we checked
+                self._build_lock.release()
+                return
+            threading.Thread(target=self._rebuild, daemon=True).start()
+
+    def _rebuild(self):
+        try:
+            # A clear() during the rebuild marks it stale again
+            self._stale = False
+            self.build()
+        except Exception:
+            self._stale = True
+            logger.exception('Rebuilding %s failed', type(self).__name__)
+        finally:
+            connection.close()  # This thread's own connection
+            self._build_lock.release()
+
+    def clear(self):
+        """Have the next lookup rebuild the index from the database."""
+        self._stale = True
@@ -0,0 +1,65 @@
+"""
+Site-wide counters and the top-shops leaderboard for the customer dashboard.
+
+The leaderboard reads the per-shop ShopStats rows (shops.stats), which the
+product signals already keep current, through an index on ``total``: the
+top shops are the first few index entries, however many shops there are.
+Every shop gets a stats row when it is created so shops without products
+still rank.
+
+The product and shop totals are cached counters moved by ``cache.incr``
+from the model signals once the write commits. A missing counter (cold
+cache, eviction, or a bulk write that dropped it) is recounted on the next
+read, and counters expire after COUNTER_TIMEOUT so any drift is bounded.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+from accounts.models import ShopOwnerProfile
+from .models import Product, ShopStats
+
+COUNTER_KEY = 'counter:{name}'
+COUNTER_TIMEOUT = 60 * 60
+COUNTER_SOURCES = {
+    'products': lambda: Product.objects.count(),
+    'shops': lambda: ShopOwnerProfile.objects.count(),
+}
+
+
+def counter(name):
+    key = COUNTER_KEY.format(name=name)
+    value = cache.get(key)
+    if value is None:
+        value = COUNTER_SOURCES[name]()
+        # add() so a count taken while another process filled the key loses
+        cache.add(key, value, timeout=COUNTER_TIMEOUT)
+    return value
+
+
+def adjust_counter(name, delta):
+    def adjust():
+        try:
+            cache.incr(COUNTER_KEY.format(name=name), delta)
+        except ValueError:
+            pass  # Not cached: the next read counts from the database
+    transaction.on_commit(adjust)
+
+
+def reset_counter(name):
+    transaction.on_commit(lambda: cache.delete(COUNTER_KEY.format(name=name)))
+
+
+def top_shops(count=5):
+    """The shops with the most products, as dicts for the dashboard."""
+    rows = (
+        ShopStats.objects.select_related('shop')
+        .order_by('-total', 'shop_id')[:count]
+    )
+    return [
+        {
+            'id': stats.shop_id,
+            'shop_name': stats.shop.shop_name,
+            'product_count': stats.total,
+        }
+        for stats in rows
+    ]
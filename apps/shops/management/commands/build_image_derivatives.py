@@ -0,0 +1,40 @@
+import posixpath
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from shops.images import UPLOAD_DIRS, available_widths, build_derivatives
+
+
+def stored_files(directory):
+    """Every file under ``directory`` in default storage."""
+    try:
+        subdirs, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield posixpath.join(directory, name)
+    for subdir in subdirs:
+        yield from stored_files(posixpath.join(directory, subdir))
+
+
+class Command(BaseCommand):
+    help = 'Builds resized WebP/JPEG copies of images already in media/product_images and media/profile_pics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', action='append', dest='dirs', choices=sorted(UPLOAD_DIRS),
+                            help='Only this upload directory (repeatable)')
+        parser.add_argument('--force', action='store_true', help='Rebuild copies that already exist')
+
+    def handle(self, *args, **options):
+        built = skipped = failed = 0
+        for directory in options['dirs'] or UPLOAD_DIRS:
+            kind = UPLOAD_DIRS[directory]
+            for name in stored_files(directory):
+                if not options['force'] and available_widths(name):
+                    skipped += 1
+                elif build_derivatives(name, kind, force=options['force']):
+                    built += 1
+                else:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f'Skipped {name}: not a readable image'))
+        self.stdout.write(self.style.SUCCESS(f'Built {built} images, {skipped} already done, {failed} failed'))
@@ -0,0 +1,38 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from shops.export import FORMATS, export_stream
+from shops.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Streams products to a CSV or JSON Lines file (whole catalog, or one shop)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shop', type=int, default=None, help='Only this ShopOwnerProfile id')
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--after', type=int, default=0, help='Resume after this product id')
+        parser.add_argument('--gzip', action='store_true', help='gzip the output')
+        parser.add_argument('--output', default='-', help='File to write, "-" for stdout')
+
+    def handle(self, *args, **options):
+        queryset = Product.objects.all()
+        if options['shop'] is not None:
+            queryset = queryset.filter(shop_owner_id=options['shop'])
+
+        stream = export_stream(queryset, options['format'], after=options['after'], compress=options['gzip'])
+        if options['output'] == '-':
+            for chunk in stream:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+
+        # Appending lets an interrupted export be resumed with --after
+        mode = 'ab' if options['after'] else 'wb'
+        try:
+            with open(options['output'], mode) as output:
+                for chunk in stream:
+                    output.write(chunk)
+        except OSError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Exported products to {options['output']}"))
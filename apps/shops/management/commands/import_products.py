@@ -0,0 +1,43 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import ShopOwnerProfile
+from shops.importer import ProductImportError, import_products, iter_rows
+
+
+class Command(BaseCommand):
+    help = 'Imports products for a shop from a CSV or XLSX file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('shop_id', type=int, help='ShopOwnerProfile id')
+        parser.add_argument('path', help='.csv or .xlsx file')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Rows validated and written per transaction')
+        parser.add_argument('--errors', default=None, help='Write failed rows to this CSV file')
+
+    def handle(self, *args, **options):
+        try:
+            shop = ShopOwnerProfile.objects.get(pk=options['shop_id'])
+        except ShopOwnerProfile.DoesNotExist:
+            raise CommandError(f"Shop {options['shop_id']} does not exist")
+
+        report = open(options['errors'], 'w', newline='') if options['errors'] else None
+        try:
+            with open(options['path'], 'rb') as file:
+                result = import_products(
+                    shop,
+                    iter_rows(file, options['path']),
+                    error_writer=csv.writer(report) if report else None,
+                    chunk_size=options['chunk_size'],
+                    progress=lambda result: self.stdout.write(
+                        f'{result.rows} rows: {result.created} created, {result.updated} updated, {result.failed} failed'
+                    ),
+                )
+        except ProductImportError as e:
+            raise CommandError(str(e))
+        finally:
+            if report:
+                report.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.created + result.updated} of {result.rows} rows into {shop.shop_name}'
+        ))
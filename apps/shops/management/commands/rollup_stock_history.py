@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from shops.history import rollup_history
+
+
+class Command(BaseCommand):
+    help = 'Rolls stock/price history up into hourly and daily dashboard figures (run hourly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shop', type=int, action='append', dest='shops', help='Only this ShopOwnerProfile id (repeatable)')
+
+    def handle(self, *args, **options):
+        shops, hours = rollup_history(shop_ids=options['shops'])
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {hours} hours across {shops} shops'))
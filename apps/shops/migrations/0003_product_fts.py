@@ -0,0 +1,87 @@
+from django.db import migrations
+
+
+# FTS5 index over the searchable product text. The triggers keep it in sync
+# with shops_product and with shop renames in accounts_shopownerprofile, so
+# every write path (forms, admin, bulk saves) is covered.
+FORWARD_SQL = [
+    """
+    CREATE VIRTUAL TABLE shops_product_fts USING fts5(
+        name, description, extra_note, shop_name,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO shops_product_fts (rowid, name, description, extra_note, shop_name)
+    SELECT p.id, p.name, p.description, COALESCE(p.extra_note, ''), s.shop_name
+    FROM shops_product p
+    JOIN accounts_shopownerprofile s ON s.id = p.shop_owner_id
+    """,
+    """
+    CREATE TRIGGER shops_product_fts_insert AFTER INSERT ON shops_product BEGIN
+        INSERT INTO shops_product_fts (rowid, name, description, extra_note, shop_name)
+        VALUES (
+            new.id, new.name, new.description, COALESCE(new.extra_note, ''),
+            (SELECT shop_name FROM accounts_shopownerprofile WHERE id = new.shop_owner_id)
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER shops_product_fts_update
+    AFTER UPDATE OF name, description, extra_note, shop_owner_id ON shops_product BEGIN
+        UPDATE shops_product_fts SET
+            name = new.name,
+            description = new.description,
+            extra_note = COALESCE(new.extra_note, ''),
+            shop_name = (SELECT shop_name FROM accounts_shopownerprofile WHERE id = new.shop_owner_id)
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER shops_product_fts_delete AFTER DELETE ON shops_product BEGIN
+        DELETE FROM shops_product_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER shops_product_fts_shop_update
+    AFTER UPDATE OF shop_name ON accounts_shopownerprofile BEGIN
+        UPDATE shops_product_fts SET shop_name = new.shop_name
+        WHERE rowid IN (SELECT id FROM shops_product WHERE shop_owner_id = new.id);
+    END
+    """,
+]
+
+BACKWARD_SQL = [
+    "DROP TRIGGER IF EXISTS shops_product_fts_shop_update",
+    "DROP TRIGGER IF EXISTS shops_product_fts_delete",
+    "DROP TRIGGER IF EXISTS shops_product_fts_update",
+    "DROP TRIGGER IF EXISTS shops_product_fts_insert",
+    "DROP TABLE IF EXISTS shops_product_fts",
+]
+
+
+def create_fts_index(apps, schema_editor):
+    # Other backends fall back to icontains lookups in shops.search
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in FORWARD_SQL:
+        schema_editor.execute(statement)
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in BACKWARD_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shops', '0002_remove_product_city'),
+        ('accounts', '0009_alter_customerprofile_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
@@ -0,0 +1,73 @@
+from django.db import migrations
+
+
+# R*Tree index over shop coordinates, kept in sync with
+# accounts_shopownerprofile by triggers. Shops without coordinates are not
+# indexed and never match a location filter.
+FORWARD_SQL = [
+    """
+    CREATE VIRTUAL TABLE shops_shop_rtree USING rtree(
+        id, min_lat, max_lat, min_lng, max_lng
+    )
+    """,
+    """
+    INSERT INTO shops_shop_rtree (id, min_lat, max_lat, min_lng, max_lng)
+    SELECT id, latitude, latitude, longitude, longitude
+    FROM accounts_shopownerprofile
+    WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    """,
+    """
+    CREATE TRIGGER shops_shop_rtree_insert AFTER INSERT ON accounts_shopownerprofile
+    WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN
+        INSERT INTO shops_shop_rtree (id, min_lat, max_lat, min_lng, max_lng)
+        VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+    END
+    """,
+    """
+    CREATE TRIGGER shops_shop_rtree_update
+    AFTER UPDATE OF latitude, longitude ON accounts_shopownerprofile BEGIN
+        DELETE FROM shops_shop_rtree WHERE id = old.id;
+        INSERT INTO shops_shop_rtree (id, min_lat, max_lat, min_lng, max_lng)
+        SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude
+        WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+    END
+    """,
+    """
+    CREATE TRIGGER shops_shop_rtree_delete AFTER DELETE ON accounts_shopownerprofile BEGIN
+        DELETE FROM shops_shop_rtree WHERE id = old.id;
+    END
+    """,
+]
+
+BACKWARD_SQL = [
+    "DROP TRIGGER IF EXISTS shops_shop_rtree_delete",
+    "DROP TRIGGER IF EXISTS shops_shop_rtree_update",
+    "DROP TRIGGER IF EXISTS shops_shop_rtree_insert",
+    "DROP TABLE IF EXISTS shops_shop_rtree",
+]
+
+
+def create_rtree_index(apps, schema_editor):
+    # Other backends fall back to a latitude/longitude range filter in shops.geo
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in FORWARD_SQL:
+        schema_editor.execute(statement)
+
+
+def drop_rtree_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in BACKWARD_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shops', '0003_product_fts'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_rtree_index, drop_rtree_index),
+    ]
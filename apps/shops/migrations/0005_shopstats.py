@@ -0,0 +1,52 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_stats(apps, schema_editor):
+    from shops.models import LOW_STOCK_THRESHOLD
+
+    Product = apps.get_model('shops', 'Product')
+    ShopStats = apps.get_model('shops', 'ShopStats')
+    active = Q(is_active=True)
+    rows = (
+        Product.objects.values('shop_owner_id')
+        .annotate(
+            total=Count('id'),
+            active=Count('id', filter=active),
+            in_stock=Count('id', filter=active & Q(stock__gt=LOW_STOCK_THRESHOLD)),
+            low_stock=Count('id', filter=active & Q(stock__gt=0, stock__lte=LOW_STOCK_THRESHOLD)),
+            out_of_stock=Count('id', filter=active & Q(stock=0)),
+        )
+        .order_by()
+    )
+    ShopStats.objects.bulk_create(
+        [ShopStats(shop_id=row.pop('shop_owner_id'), **row) for row in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_alter_customerprofile_options_and_more'),
+        ('shops', '0004_shop_rtree'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopStats',
+            fields=[
+                ('shop', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='accounts.shopownerprofile')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('active', models.PositiveIntegerField(default=0)),
+                ('in_stock', models.PositiveIntegerField(default=0)),
+                ('low_stock', models.PositiveIntegerField(default=0)),
+                ('out_of_stock', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shops', '0005_shopstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shopstats',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def seed_history(apps, schema_editor):
+    # One row per existing product, so rollups start from the current catalog
+    Product = apps.get_model('shops', 'Product')
+    ProductHistory = apps.get_model('shops', 'ProductHistory')
+    now = timezone.now()
+    rows = Product.objects.values_list('id', 'shop_owner_id', 'stock', 'price', 'is_active')
+    ProductHistory.objects.bulk_create(
+        [
+            ProductHistory(product_id=pk, shop_id=shop_id, stock=stock, price=price, is_active=is_active, recorded_at=now)
+            for pk, shop_id, stock, price, is_active in rows.iterator(chunk_size=2000)
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_alter_customerprofile_options_and_more'),
+        ('shops', '0006_shopstats_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.PositiveIntegerField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('is_active', models.BooleanField()),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('recorded_at', models.DateTimeField()),
+                ('product', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='history', to='shops.product')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_history', to='accounts.shopownerprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['shop', 'recorded_at'], name='shops_produ_shop_id_376cf3_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ShopStockRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('active', models.PositiveIntegerField(default=0)),
+                ('in_stock', models.PositiveIntegerField(default=0)),
+                ('low_stock', models.PositiveIntegerField(default=0)),
+                ('out_of_stock', models.PositiveIntegerField(default=0)),
+                ('stock_units', models.PositiveBigIntegerField(default=0)),
+                ('price_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('changes', models.PositiveIntegerField(default=0)),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_rollups', to='accounts.shopownerprofile')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('shop', 'period', 'bucket_start'), name='unique_shop_rollup_bucket')],
+            },
+        ),
+        migrations.RunPython(seed_history, migrations.RunPython.noop),
+    ]
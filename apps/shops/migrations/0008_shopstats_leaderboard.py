@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:36
+
+from django.db import migrations, models
+
+
+def add_missing_stats(apps, schema_editor):
+    # Shops without products had no stats row; give them an empty one so they rank
+    ShopOwnerProfile = apps.get_model('accounts', 'ShopOwnerProfile')
+    ShopStats = apps.get_model('shops', 'ShopStats')
+    missing = ShopOwnerProfile.objects.filter(stats__isnull=True).values_list('id', flat=True)
+    ShopStats.objects.bulk_create([ShopStats(shop_id=pk) for pk in missing], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_alter_customerprofile_options_and_more'),
+        ('shops', '0007_product_history'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shopstats',
+            index=models.Index(fields=['-total', 'shop'], name='shopstats_leaderboard_idx'),
+        ),
+        migrations.RunPython(add_missing_stats, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
 from accounts.models import ShopOwnerProfile
 
+# Products with stock at or below this (but above zero) count as low stock
+LOW_STOCK_THRESHOLD = 5
+
 # Create your models here.
 class Product(models.Model):
     shop_owner = models.ForeignKey(ShopOwnerProfile, on_delete=models.CASCADE, related_name='products')
@@ -17,3 +20,72 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+
+
+# Per-shop product counts for the dashboard, kept current by shops/stats.py
+class ShopStats(models.Model):
+    shop = models.OneToOneField(ShopOwnerProfile, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    total = models.PositiveIntegerField(default=0)
+    active = models.PositiveIntegerField(default=0)
+    in_stock = models.PositiveIntegerField(default=0)
+    low_stock = models.PositiveIntegerField(default=0)
+    out_of_stock = models.PositiveIntegerField(default=0)
+    version = models.PositiveBigIntegerField(default=0)  # bumped on every change, used as the dashboard ETag
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Top-shops leaderboard on the customer dashboard (shops/leaderboard.py)
+        indexes = [models.Index(fields=['-total', 'shop'], name='shopstats_leaderboard_idx')]
+
+    def __str__(self):
+        return f"Stats for {self.shop.shop_name}"
+
+
+# Append-only log of product stock/price changes, one row per change (shops/history.py)
+class ProductHistory(models.Model):
+    # No DB constraint so the history of a deleted product stays for the rollups
+    product = models.ForeignKey(Product, on_delete=models.DO_NOTHING, db_constraint=False, related_name='history')
+    shop = models.ForeignKey(ShopOwnerProfile, on_delete=models.CASCADE, related_name='product_history')
+    stock = models.PositiveIntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    is_active = models.BooleanField()
+    is_deleted = models.BooleanField(default=False)
+    recorded_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=['shop', 'recorded_at'])]
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.recorded_at}"
+
+
+# Hourly and daily downsampled shop stock figures for the dashboard charts
+class ShopStockRollup(models.Model):
+    HOUR = 'hour'
+    DAY = 'day'
+    PERIOD_CHOICES = [(HOUR, 'Hourly'), (DAY, 'Daily')]
+
+    shop = models.ForeignKey(ShopOwnerProfile, on_delete=models.CASCADE, related_name='stock_rollups')
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    bucket_start = models.DateTimeField()
+    # Counts and sums as they stood at the end of the bucket
+    total = models.PositiveIntegerField(default=0)
+    active = models.PositiveIntegerField(default=0)
+    in_stock = models.PositiveIntegerField(default=0)
+    low_stock = models.PositiveIntegerField(default=0)
+    out_of_stock = models.PositiveIntegerField(default=0)
+    stock_units = models.PositiveBigIntegerField(default=0)  # units across active products
+    price_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # sum of active prices
+    changes = models.PositiveIntegerField(default=0)  # history rows inside the bucket
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'period', 'bucket_start'], name='unique_shop_rollup_bucket'),
+        ]
+
+    @property
+    def average_price(self):
+        return self.price_total / self.active if self.active else None
+
+    def __str__(self):
+        return f"{self.shop_id} {self.period} {self.bucket_start}"
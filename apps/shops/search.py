@@ -0,0 +1,145 @@
+"""
+Full-text product search backed by the ``shops_product_fts`` FTS5 table.
+
+The index is created and kept in sync by triggers (see migration
+``shops.0003_product_fts``). Queries return ranked product ids so callers can
+paginate the id list and load only the rows they render. On databases without
+FTS5 the same functions fall back to ``icontains`` lookups.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Product
+
+FTS_TABLE = 'shops_product_fts'
+
+# Searchable columns and their bm25 weights, in table column order
+FTS_COLUMNS = ('name', 'description', 'extra_note', 'shop_name')
+FTS_WEIGHTS = (10.0, 1.0, 1.0, 5.0)
+
+# Upper bound on ranked results returned for a single query
+SEARCH_RESULT_LIMIT = 1000
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+FALLBACK_LOOKUPS = {
+    'name': 'name__icontains',
+    'description': 'description__icontains',
+    'extra_note': 'extra_note__icontains',
+    'shop_name': 'shop_owner__shop_name__icontains',
+}
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(query.lower())
+
+
+def build_match_expression(query, columns=None):
+    """Turn free text into an FTS5 prefix query, e.g. 'ric ba' -> '"ric"* "ba"*'"""
+    tokens = tokenize(query)
+    if not tokens:
+        return ''
+    expression = ' '.join(f'"{token}"*' for token in tokens)
+    if columns:
+        expression = '{%s} : (%s)' % (' '.join(columns), expression)
+    return expression
+
+
+_ready_tables = set()
+
+
+def virtual_table_ready(table):
+    # Only a positive answer is cached, so running migrate in a live process
+    # switches over to the index without a restart
+    if table not in _ready_tables:
+        if connection.vendor == 'sqlite' and table in connection.introspection.table_names():
+            _ready_tables.add(table)
+    return table in _ready_tables
+
+
+def fts_available():
+    return virtual_table_ready(FTS_TABLE)
+
+
+def search_product_ids(query, shop_owner=None, active_only=True, columns=None, limit=SEARCH_RESULT_LIMIT):
+    """Return ids of products matching ``query``, best match first."""
+    match = build_match_expression(query, columns)
+    if not match:
+        return []
+
+    if not fts_available():
+        return _fallback_product_ids(query, shop_owner, active_only, columns, limit)
+
+    filters = ''
+    params = [match]
+    if active_only:
+        filters += ' AND p.is_active = %s'
+        params.append(True)
+    if shop_owner is not None:
+        filters += ' AND p.shop_owner_id = %s'
+        params.append(getattr(shop_owner, 'pk', shop_owner))
+    params.append(limit)
+
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    sql = f"""
+        SELECT p.id FROM {FTS_TABLE}
+        JOIN shops_product p ON p.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH %s{filters}
+        ORDER BY bm25({FTS_TABLE}, {weights}), p.id DESC
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_shop_names(query, limit=2):
+    """Return distinct names of shops with active products matching ``query``."""
+    match = build_match_expression(query, columns=('shop_name',))
+    if not match:
+        return []
+
+    if not fts_available():
+        return list(
+            Product.objects.filter(shop_owner__shop_name__icontains=query, is_active=True)
+            .values_list('shop_owner__shop_name', flat=True).distinct()[:limit]
+        )
+
+    # bm25() cannot be used inside an aggregate, so dedupe the ranked rows here
+    sql = f"""
+        SELECT {FTS_TABLE}.shop_name FROM {FTS_TABLE}
+        JOIN shops_product p ON p.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH %s AND p.is_active = %s
+        ORDER BY bm25({FTS_TABLE})
+        LIMIT %s
+    """
+    shop_names = []
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, True, SEARCH_RESULT_LIMIT])
+        for (shop_name,) in cursor.fetchall():
+            if shop_name not in shop_names:
+                shop_names.append(shop_name)
+                if len(shop_names) == limit:
+                    break
+    return shop_names
+
+
+def products_in_order(queryset, product_ids):
+    """Load ``product_ids`` from ``queryset`` preserving the given order."""
+    products = queryset.in_bulk(product_ids)
+    return [products[pk] for pk in product_ids if pk in products]
+
+
+def _fallback_product_ids(query, shop_owner, active_only, columns, limit):
+    condition = Q()
+    for column in columns or FTS_COLUMNS:
+        condition |= Q(**{FALLBACK_LOOKUPS[column]: query})
+
+    qs = Product.objects.filter(condition)
+    if active_only:
+        qs = qs.filter(is_active=True)
+    if shop_owner is not None:
+        qs = qs.filter(shop_owner=shop_owner)
+    return list(qs.order_by('-id').values_list('id', flat=True)[:limit])
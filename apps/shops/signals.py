@@ -0,0 +1,148 @@
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from accounts.models import ShopOwnerProfile, User
+from jobs.queue import enqueue
+from .autocomplete import prefix_index
+from .history import history_entry, product_state
+from .images import available_widths
+from .leaderboard import adjust_counter, reset_counter
+from .models import Product, ShopStats
+from .spelling import spelling_corrector
+from .stats import apply_delta, product_buckets
+
+# Sent with ``shop_id`` once bulk writes (bulk_create, bulk_update,
+# QuerySet.update) to a shop's products, which skip the model signals below,
+# have committed. The writer refreshes the shop's stats row itself, inside
+# its transaction; receivers clear what was built from the old rows
+products_bulk_changed = Signal()
+
+# Sent with ``changes``, a list of (product_id, before, after) where each state
+# is history.product_state() (stock, price, is_active), whenever existing
+# products' stock, price or active flag change, by single saves and bulk writes
+product_states_changed = Signal()
+
+
+def queue_derivatives(name, before, kind):
+    # Resized copies of a new upload are made by the job workers. Only a file
+    # that differs from the stored one (``before``, None on create) is queued,
+    # so other edits, and files that never get copies, do not queue it again
+    if name and name != before and not available_widths(name):
+        enqueue('shops.images.build_derivatives', name=name, kind=kind)
+
+
+@receiver(pre_save, sender=Product)
+def product_saving(sender, instance, **kwargs):
+    # Remember the stored state so the shop stats can move the product between
+    # buckets, the history only records real changes and an image is only
+    # resized when it is new
+    instance._stats_before = instance._image_before = None
+    if instance.pk:
+        stored = (
+            Product.objects.filter(pk=instance.pk)
+            .values_list('shop_owner_id', 'is_active', 'stock', 'price', 'image')
+            .first()
+        )
+        if stored is not None:
+            instance._stats_before, instance._image_before = stored[:4], stored[4]
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created=False, **kwargs):
+    prefix_index.add_product(instance.pk, instance.name, instance.shop_owner_id, instance.is_active)
+    spelling_corrector.update_document('product', instance.pk, instance.name, instance.description)
+
+    added = product_buckets(instance.is_active, instance.stock)
+    before = getattr(instance, '_stats_before', None)
+    if before is None:
+        apply_delta(instance.shop_owner_id, added=added)
+    elif before[0] != instance.shop_owner_id:
+        apply_delta(before[0], removed=product_buckets(before[1], before[2]), create_missing=False)
+        apply_delta(instance.shop_owner_id, added=added)
+    else:
+        apply_delta(instance.shop_owner_id, removed=product_buckets(before[1], before[2]), added=added)
+
+    if created:
+        adjust_counter('products', 1)
+
+    queue_derivatives(instance.image.name, getattr(instance, '_image_before', None), 'product')
+
+    if before is None:
+        history_entry(instance).save()
+    elif before[0] != instance.shop_owner_id:
+        # Moved shops: it leaves the old shop's history and joins the new one's
+        history_entry(instance, deleted=True, shop_id=before[0]).save()
+        history_entry(instance).save()
+    elif (before[2], before[3], before[1]) != product_state(instance):
+        history_entry(instance).save()
+        product_states_changed.send(
+            sender=Product, changes=[(instance.pk, (before[2], before[3], before[1]), product_state(instance))],
+        )
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, origin=None, **kwargs):
+    prefix_index.remove_product(instance.pk)
+    spelling_corrector.remove_document('product', instance.pk)
+    # No refresh on a missing row: the shop itself may be being deleted
+    apply_delta(
+        instance.shop_owner_id,
+        removed=product_buckets(instance.is_active, instance.stock),
+        create_missing=False,
+    )
+    adjust_counter('products', -1)
+    # Only for a product deleted on its own: bulk deletes record their history
+    # in one go, and a deleted shop takes its history with it
+    if isinstance(origin, Product):
+        history_entry(instance, deleted=True).save()
+
+
+@receiver(post_save, sender=ShopOwnerProfile)
+def shop_saved(sender, instance, created=False, **kwargs):
+    prefix_index.add_shop(instance.pk, instance.shop_name)
+    spelling_corrector.update_document('shop', instance.pk, instance.shop_name)
+    if created:
+        # An empty stats row so the new shop is on the leaderboard from the start
+        ShopStats.objects.get_or_create(shop=instance)
+        adjust_counter('shops', 1)
+
+
+@receiver(post_delete, sender=ShopOwnerProfile)
+def shop_deleted(sender, instance, **kwargs):
+    prefix_index.remove_shop(instance.pk)
+    spelling_corrector.remove_document('shop', instance.pk)
+    adjust_counter('shops', -1)
+
+
+def _saves_picture(instance, update_fields):
+    # Not for e.g. the last_login update on every sign-in, or a deferred picture
+    if update_fields and 'profile_picture' not in update_fields:
+        return False
+    return 'profile_picture' in instance.__dict__
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    instance._picture_before = None
+    if instance.pk and _saves_picture(instance, update_fields):
+        instance._picture_before = (
+            User.objects.filter(pk=instance.pk).values_list('profile_picture', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    if not _saves_picture(instance, update_fields):
+        return
+    picture = instance.profile_picture.name
+    if picture == User._meta.get_field('profile_picture').default:
+        return  # The shared default picture
+    queue_derivatives(picture, getattr(instance, '_picture_before', None), 'profile')
+
+
+@receiver(products_bulk_changed)
+def products_bulk_updated(sender, shop_id, **kwargs):
+    reset_counter('products')
+    # The in-memory indexes rebuild from the database on next use
+    prefix_index.clear()
+    spelling_corrector.clear()
@@ -0,0 +1,176 @@
+"""
+"Did you mean" spelling correction over the catalog vocabulary.
+
+Uses a SymSpell-style deletion dictionary: every vocabulary word is stored
+under each string obtainable by deleting up to MAX_EDIT_DISTANCE characters
+from its first PREFIX_LENGTH characters. A misspelled word is corrected by
+generating its own deletes and checking only the words that share one, so
+lookups never scan the vocabulary.
+
+Vocabulary comes from product names, descriptions and shop names. Like the
+autocomplete index it is built on first use, kept current from the model
+signals in shops.signals and rebuilt in the background after
+SPELLING_INDEX_MAX_AGE seconds (shops.indexes).
+"""
+import time
+
+from accounts.models import ShopOwnerProfile
+
+from .indexes import InMemoryIndex
+from .models import Product
+from .search import tokenize
+
+MAX_EDIT_DISTANCE = 2
+PREFIX_LENGTH = 7
+MIN_WORD_LENGTH = 3
+
+
+def edit_distance(a, b, max_distance=MAX_EDIT_DISTANCE):
+    """Optimal string alignment distance, or max_distance + 1 if larger."""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def deletes(word, max_distance=MAX_EDIT_DISTANCE):
+    word = word[:PREFIX_LENGTH]
+    results = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        results |= frontier
+    return results
+
+
+def vocabulary_words(text):
+    return {
+        word for word in tokenize(text or '')
+        if len(word) >= MIN_WORD_LENGTH and not word.isdigit()
+    }
+
+
+class SpellingCorrector(InMemoryIndex):
+    max_age_setting = 'SPELLING_INDEX_MAX_AGE'
+
+    def __init__(self):
+        super().__init__()
+        self._frequencies = {}    # word -> number of documents containing it
+        self._deletes = {}        # delete variant -> set of words
+        self._documents = {}      # ('product' | 'shop', pk) -> frozenset of words
+
+    def build(self):
+        documents = {}
+        for pk, name, description in Product.objects.values_list(
+            'id', 'name', 'description'
+        ).iterator(chunk_size=2000):
+            documents[('product', pk)] = frozenset(vocabulary_words(name) | vocabulary_words(description))
+        for pk, shop_name in ShopOwnerProfile.objects.values_list('id', 'shop_name'):
+            documents[('shop', pk)] = frozenset(vocabulary_words(shop_name))
+
+        frequencies = {}
+        for words in documents.values():
+            for word in words:
+                frequencies[word] = frequencies.get(word, 0) + 1
+        delete_map = {}
+        for word in frequencies:
+            for variant in deletes(word):
+                delete_map.setdefault(variant, set()).add(word)
+
+        with self._lock:
+            self._documents = documents
+            self._frequencies = frequencies
+            self._deletes = delete_map
+            self._built_at = time.monotonic()
+
+    # Incremental updates
+
+    def update_document(self, kind, pk, *texts):
+        words = set()
+        for text in texts:
+            words |= vocabulary_words(text)
+        with self._lock:
+            if self._built_at is None:
+                return
+            old_words = self._documents.get((kind, pk), frozenset())
+            for word in old_words - words:
+                self._discard_word(word)
+            for word in words - old_words:
+                self._add_word(word)
+            self._documents[(kind, pk)] = frozenset(words)
+
+    def remove_document(self, kind, pk):
+        with self._lock:
+            if self._built_at is None:
+                return
+            for word in self._documents.pop((kind, pk), ()):
+                self._discard_word(word)
+
+    def _add_word(self, word):
+        if word not in self._frequencies:
+            self._frequencies[word] = 0
+            for variant in deletes(word):
+                self._deletes.setdefault(variant, set()).add(word)
+        self._frequencies[word] += 1
+
+    def _discard_word(self, word):
+        self._frequencies[word] -= 1
+        if self._frequencies[word] > 0:
+            return
+        del self._frequencies[word]
+        for variant in deletes(word):
+            candidates = self._deletes.get(variant)
+            if candidates is not None:
+                candidates.discard(word)
+                if not candidates:
+                    del self._deletes[variant]
+
+    # Lookups
+
+    def suggest_word(self, word):
+        """Closest vocabulary word to ``word``, preferring frequent words."""
+        self.ensure_built()
+        with self._lock:
+            if word in self._frequencies:
+                return word
+            best = None
+            best_key = None
+            for variant in deletes(word):
+                for candidate in self._deletes.get(variant, ()):
+                    distance = edit_distance(word, candidate)
+                    if distance > MAX_EDIT_DISTANCE:
+                        continue
+                    key = (distance, -self._frequencies[candidate], candidate)
+                    if best_key is None or key < best_key:
+                        best, best_key = candidate, key
+            return best
+
+    def correct(self, query):
+        """Return a corrected version of ``query``, or None if nothing changed."""
+        tokens = tokenize(query)
+        corrected = []
+        changed = False
+        for token in tokens:
+            suggestion = None
+            if len(token) >= MIN_WORD_LENGTH and not token.isdigit():
+                suggestion = self.suggest_word(token)
+            if suggestion and suggestion != token:
+                changed = True
+                corrected.append(suggestion)
+            else:
+                corrected.append(token)
+        return ' '.join(corrected) if changed else None
+
+
+spelling_corrector = SpellingCorrector()
@@ -0,0 +1,135 @@
+"""
+Per-shop product counts for the shop dashboard.
+
+Each shop has one ShopStats row. Product signals (shops.signals) move a
+product between buckets with a single ``UPDATE ... SET col = col + 1`` on
+that row, inside the same transaction as the product write, so the
+dashboard and its polling endpoint read one row instead of counting
+products. ``refresh_shop_stats`` recomputes a row from scratch in one
+conditional-aggregation query; it backfills missing rows and is used after
+bulk writes that bypass signals. Every change is announced to the live
+dashboard streams (shops.events) once its transaction commits.
+"""
+import contextvars
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .events import stats_broker
+from .models import LOW_STOCK_THRESHOLD, Product, ShopStats
+
+STAT_FIELDS = ('total', 'active', 'in_stock', 'low_stock', 'out_of_stock')
+
+_deferred = contextvars.ContextVar('shop_stats_deferred', default=False)
+
+
+def stock_bucket(stock):
+    if stock == 0:
+        return 'out_of_stock'
+    if stock <= LOW_STOCK_THRESHOLD:
+        return 'low_stock'
+    return 'in_stock'
+
+
+def product_buckets(is_active, stock):
+    """The stats fields a product with this state counts towards."""
+    if not is_active:
+        return {'total'}
+    return {'total', 'active', stock_bucket(stock)}
+
+
+def stock_counts(queryset):
+    """Every stats field for ``queryset`` in a single scan."""
+    active = Q(is_active=True)
+    return queryset.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=active),
+        in_stock=Count('id', filter=active & Q(stock__gt=LOW_STOCK_THRESHOLD)),
+        low_stock=Count('id', filter=active & Q(stock__gt=0, stock__lte=LOW_STOCK_THRESHOLD)),
+        out_of_stock=Count('id', filter=active & Q(stock=0)),
+    )
+
+
+def refresh_shop_stats(shop_id):
+    counts = stock_counts(Product.objects.filter(shop_owner_id=shop_id))
+    updated = ShopStats.objects.filter(shop_id=shop_id).update(
+        version=F('version') + 1, updated_at=timezone.now(), **counts,
+    )
+    if updated:
+        stats = ShopStats.objects.get(shop_id=shop_id)
+    else:
+        stats = ShopStats.objects.create(shop_id=shop_id, **counts)
+    _announce(shop_id)
+    return stats
+
+
+def shop_stats(shop):
+    """The stats row for ``shop``, created on first use."""
+    try:
+        return ShopStats.objects.get(shop_id=shop.pk)
+    except ShopStats.DoesNotExist:
+        return refresh_shop_stats(shop.pk)
+
+
+@contextmanager
+def defer_stats():
+    """
+    Skip per-product deltas inside the block, e.g. while a bulk delete sends
+    one signal per row; the caller refreshes the shop's row afterwards.
+    """
+    token = _deferred.set(True)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+
+
+def apply_delta(shop_id, removed=(), added=(), create_missing=True):
+    """
+    Move one product out of the ``removed`` fields and into the ``added``
+    ones. Returns False if the shop has no stats row yet; with
+    ``create_missing`` the row is then built from the products table.
+    """
+    if _deferred.get():
+        return True
+    changes = {}
+    for field in removed:
+        changes[field] = changes.get(field, 0) - 1
+    for field in added:
+        changes[field] = changes.get(field, 0) + 1
+    changes = {field: F(field) + n for field, n in changes.items() if n}
+    if not changes:
+        return True
+
+    updated = ShopStats.objects.filter(shop_id=shop_id).update(
+        version=F('version') + 1, updated_at=timezone.now(), **changes,
+    )
+    if updated:
+        _announce(shop_id)
+    elif create_missing:
+        refresh_shop_stats(shop_id)
+    return bool(updated)
+
+
+def stats_payload(stats):
+    """Dashboard counts as sent by ``?partial=true`` and the live stream."""
+    return {
+        'total_products': stats.total,
+        'active_products': stats.active,
+        'low_stock_products': stats.low_stock,
+        'out_of_stock_products': stats.out_of_stock,
+        'in_stock_count': stats.in_stock,
+        'low_stock_count': stats.low_stock,
+        'out_of_stock_count': stats.out_of_stock,
+    }
+
+
+def read_payload(shop_id):
+    stats = ShopStats.objects.filter(shop_id=shop_id).first()
+    return stats_payload(stats or refresh_shop_stats(shop_id))
+
+
+def _announce(shop_id):
+    transaction.on_commit(lambda: stats_broker.publish(shop_id))
@@ -0,0 +1,22 @@
+from django import template
+
+from shops import images
+
+register = template.Library()
+
+
+def _name(image):
+    # ImageField values are FieldFiles; plain storage names work too
+    return getattr(image, 'name', image) or ''
+
+
+@register.simple_tag
+def thumbnail(image, width, fmt='jpeg'):
+    """Usage: <img src="{% thumbnail product.image 96 %}">"""
+    return images.thumbnail_url(_name(image), int(width), fmt)
+
+
+@register.simple_tag
+def image_variants(image, width=480):
+    """Usage: {% image_variants product.image 480 as img %} then img.src, img.srcset, img.webp_srcset"""
+    return images.variants(_name(image), int(width))
@@ -5,8 +5,13 @@ app_name = 'shops'  # This registers the namespace
 
 urlpatterns = [
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/events/', views.dashboard_events, name='dashboard_events'),
     path('product/add-edit/', views.product_add_edit, name='product_add_edit'),
     path('product/list/', views.product_list, name='product_list'),
+    path('product/import/', views.product_import, name='product_import'),
+    path('product/bulk/', views.product_bulk, name='product_bulk'),
+    path('product/export/', views.product_export, name='product_export'),
+    path('catalog/export/', views.catalog_export, name='catalog_export'),
     path('product/<int:pk>/edit/', views.product_edit, name='product_edit'),
     path('product/<int:pk>/delete/', views.product_delete, name='product_delete'),
     path('product/<int:pk>/json/', views.product_json, name='product_json'),
@@ -3,10 +3,34 @@ from django.contrib.auth.decorators import login_required
 from .forms import ProductForm
 from accounts.models import ShopOwnerProfile
 from django.http import JsonResponse 
-from .models import Product
+from .models import Product, LOW_STOCK_THRESHOLD
+from .search import search_product_ids, products_in_order
+from .autocomplete import prefix_index
+from .stats import read_payload, shop_stats, stats_payload
+from .events import stats_stream
+from .history import dashboard_trend
+from .importer import ProductImportError, iter_import, iter_rows
+from .bulk import BulkOperationError, apply_operation
+from .export import FORMATS, export_filename, export_stream
+from .conditional import dashboard_etag, dashboard_last_modified, product_etag, product_last_modified
 from .forms import EditUserForm, EditShopOwnerForm, EditCustomerForm
 from django.contrib import messages
 from django.db.models import Q
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import condition, require_POST
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils.crypto import get_random_string
+import csv
+import itertools
+import json
+import tempfile
+
+# Errors returned inline by the import endpoint; the full list is in the report file
+MAX_INLINE_IMPORT_ERRORS = 50
 
 
 
@@ -16,14 +40,17 @@ def shop_search(request):
         return redirect('accounts:login')
 
     query = request.GET.get('q', '')
-    products = Product.objects.filter(shop_owner=request.user.shopownerprofile)
+    shop_owner = request.user.shopownerprofile
+    products = Product.objects.filter(shop_owner=shop_owner)
     
     if query:
-        products = products.filter(
-            Q(name__icontains=query) | 
-            Q(description__icontains=query) |
-            Q(extra_note__icontains=query)
-        ).order_by('-created_at')
+        product_ids = search_product_ids(
+            query,
+            shop_owner=shop_owner,
+            active_only=False,
+            columns=('name', 'description', 'extra_note'),
+        )
+        products = products_in_order(products, product_ids)
 
     return render(request, 'shop/search_results.html', {
         'products': products,
@@ -39,70 +66,70 @@ def shop_search_suggestions(request):
     suggestions = []
     
     if query and len(query) >= 2:
-        products = Product.objects.filter(
-            Q(name__icontains=query) | 
-            Q(description__icontains=query),
-            shop_owner=request.user.shopownerprofile
-        ).order_by('name')[:5]
-        
-        suggestions = [product.name for product in products]
+        suggestions = prefix_index.product_names(
+            query,
+            limit=5,
+            shop_id=request.user.shopownerprofile.pk,
+            active_only=False,
+        )
     
     return JsonResponse({'suggestions': suggestions})
 
 
 @login_required
+@condition(etag_func=dashboard_etag, last_modified_func=dashboard_last_modified)
 def dashboard(request):
     if not request.user.is_shop_owner:
         return redirect('accounts:login')
 
     shop_owner = request.user.shopownerprofile
-    products = Product.objects.filter(shop_owner=shop_owner)
-    recent_products = products.order_by('-created_at')[:5]
-    
-    # Calculate product stats
-    active_products = products.filter(is_active=True)
-    low_stock_products = active_products.filter(stock__lte=5, stock__gt=0)
-    out_of_stock_products = active_products.filter(stock=0)
-    
-    # Calculate percentages for stock overview
-    total_active = active_products.count()
-    in_stock_count = active_products.filter(stock__gt=5).count()
-    low_stock_count = low_stock_products.count()
-    out_of_stock_count = out_of_stock_products.count()
-    
+    recent_products = Product.objects.filter(shop_owner=shop_owner).order_by('-created_at')[:5]
+
+    # Product counts come from the shop's stats row, kept current on every product write
+    stats = shop_stats(shop_owner)
+
     in_stock_percentage = 0
-    if total_active > 0:
-        in_stock_percentage = round((in_stock_count / total_active) * 100)
+    if stats.active > 0:
+        in_stock_percentage = round((stats.in_stock / stats.active) * 100)
 
     # Check for partial refresh request
     if request.GET.get('partial') == 'true':
-        data = {
-            'total_products': products.count(),
-            'active_products': active_products.count(),
-            'low_stock_products': low_stock_products.count(),
-            'out_of_stock_products': out_of_stock_products.count(),
-            'in_stock_count': in_stock_count,
-            'low_stock_count': low_stock_count,
-            'out_of_stock_count': out_of_stock_count
-        }
-        return JsonResponse(data)
+        return JsonResponse(stats_payload(stats))
 
     context = {
-        'products': products,
+        'stats': stats,
         'recent_products': recent_products,
-        'active_products': active_products,
-        'low_stock_products': low_stock_products,
-        'out_of_stock_products': out_of_stock_products,
-        'in_stock_count': in_stock_count,
-        'low_stock_count': low_stock_count,
-        'out_of_stock_count': out_of_stock_count,
-        'in_stock_percentage': in_stock_percentage
+        'in_stock_count': stats.in_stock,
+        'low_stock_count': stats.low_stock,
+        'out_of_stock_count': stats.out_of_stock,
+        'in_stock_percentage': in_stock_percentage,
+        'stock_trend': dashboard_trend(shop_owner),
     }
     return render(request, 'shop/dashboard.html', context)
 
 
 
 
+@login_required
+async def dashboard_events(request):
+    user = await request.auser()
+    if not user.is_shop_owner:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    # An endless stream would tie up a WSGI worker; 204 tells EventSource to stop
+    # and the dashboard falls back to polling
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    shop_id = await sync_to_async(lambda: user.shopownerprofile.pk)()
+    response = StreamingHttpResponse(
+        stats_stream(shop_id, lambda: read_payload(shop_id)),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 def product_add_edit(request, pk=None):
     if not request.user.is_shop_owner:
@@ -123,7 +150,8 @@ def product_add_edit(request, pk=None):
         if request.method == 'POST':
             form = ProductForm(request.POST, request.FILES, instance=product)
             if form.is_valid():
-                form.save()
+                with transaction.atomic():
+                    form.save()
                 return JsonResponse({'message': 'Product updated successfully'})
             return JsonResponse({'error': form.errors}, status=400)
         form = ProductForm(instance=product)
@@ -135,7 +163,8 @@ def product_add_edit(request, pk=None):
         if form.is_valid():
             product = form.save(commit=False)
             product.shop_owner = shop_owner
-            product.save()
+            with transaction.atomic():
+                product.save()
             return JsonResponse({'message': 'Product created successfully'})
         return JsonResponse({'error': form.errors}, status=400)
 
@@ -145,6 +174,115 @@ def product_add_edit(request, pk=None):
 
 
 
+@login_required
+@require_POST
+def product_import(request):
+    if not request.user.is_shop_owner:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+
+    shop_owner = request.user.shopownerprofile
+    upload = request.FILES.get('file')
+    if not upload:
+        return JsonResponse({'error': 'Choose a CSV or XLSX file to import'}, status=400)
+
+    # Read the header and first row now so a bad file is a plain 400
+    try:
+        rows = iter_rows(upload.file, upload.name)
+        first = next(rows, None)
+    except ProductImportError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if first is None:
+        return JsonResponse({'error': 'The file has no product rows'}, status=400)
+    rows = itertools.chain([first], rows)
+
+    def stream():
+        # One JSON line per committed chunk, then a summary line
+        with tempfile.TemporaryFile('w+', newline='') as report:
+            result = None
+            try:
+                for result in iter_import(shop_owner, rows, csv.writer(report)):
+                    yield json.dumps({'progress': result.as_dict()}) + '\n'
+            except ProductImportError as e:
+                yield json.dumps({'error': str(e)}) + '\n'
+                return
+            yield json.dumps(_import_summary(shop_owner, result, report)) + '\n'
+
+    return StreamingHttpResponse(stream(), content_type='application/x-ndjson')
+
+
+def _import_summary(shop_owner, result, report):
+    summary = {'done': result.as_dict(), 'errors': []}
+    if result.failed:
+        report.seek(0)
+        summary['errors'] = list(itertools.islice(csv.reader(report), MAX_INLINE_IMPORT_ERRORS))
+        report.seek(0)
+        name = default_storage.save(
+            f'product_imports/{shop_owner.pk}-{get_random_string(12)}-errors.csv', File(report),
+        )
+        summary['error_report_url'] = default_storage.url(name)
+    return summary
+
+
+@login_required
+@require_POST
+def product_bulk(request):
+    if not request.user.is_shop_owner:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    try:
+        count = apply_operation(
+            request.user.shopownerprofile,
+            data.get('action'),
+            value=data.get('value'),
+            ids=data.get('ids'),
+            filters=data.get('filter'),
+        )
+    except BulkOperationError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'message': f'{count} product(s) updated', 'count': count})
+
+
+@login_required
+def product_export(request):
+    if not request.user.is_shop_owner:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    shop_owner = request.user.shopownerprofile
+    return _export_response(request, Product.objects.filter(shop_owner=shop_owner), f'products-shop-{shop_owner.pk}')
+
+
+@login_required
+def catalog_export(request):
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    return _export_response(request, Product.objects.all(), 'products-catalog')
+
+
+def _export_response(request, queryset, base_name):
+    # ?format=csv|jsonl, ?compress=gzip, ?after=<last id received> to resume
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in FORMATS:
+        return JsonResponse({'error': 'format must be csv or jsonl'}, status=400)
+    after = request.GET.get('after', '')
+    if after and not after.isdigit():
+        return JsonResponse({'error': 'after must be a product id'}, status=400)
+    compress = request.GET.get('compress') == 'gzip'
+
+    response = StreamingHttpResponse(
+        export_stream(queryset, export_format, after=int(after or 0), compress=compress),
+        content_type='application/gzip' if compress else FORMATS[export_format][0],
+    )
+    filename = export_filename(base_name, export_format, compress)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 @login_required
 def product_list(request):
     if not request.user.is_shop_owner:
@@ -156,6 +294,7 @@ def product_list(request):
     return render(request, 'shop/product-list.html', {'products': products})
 
 @login_required
+@condition(etag_func=product_etag, last_modified_func=product_last_modified)
 def product_json(request, pk):
     product = get_object_or_404(Product, pk=pk, shop_owner=request.user.shopownerprofile)
     data = {
@@ -178,7 +317,8 @@ def product_edit(request, pk):
     if request.method == 'POST':
         form = ProductForm(request.POST, request.FILES, instance=product)
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                form.save()
             return redirect('shops:product_list')
     else:
         form = ProductForm(instance=product)
@@ -189,7 +329,8 @@ def product_edit(request, pk):
 @login_required
 def product_delete(request, pk):
     product = get_object_or_404(Product, pk=pk, shop_owner=request.user.shopownerprofile)
-    product.delete()
+    with transaction.atomic():
+        product.delete()
     return redirect('shops:product_list')
 
 @login_required
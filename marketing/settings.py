@@ -51,6 +51,7 @@ INSTALLED_APPS = [
     'shops',
     'customers',
     'landing',
+    'jobs',
     'crispy_forms',  # For crispy forms
     'crispy_bootstrap5',  # For Bootstrap 5 support in crispy forms
     'widget_tweaks',
@@ -101,6 +102,25 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# The catalog, wishlist and recommendation versions, the leaderboard counters
+# and the wishlist membership maps (customers.querycache, shops.leaderboard,
+# customers.wishlist) are invalidated through this cache, so every web and job
+# worker process must share it. Django's default LocMemCache is per process
+# and would leave other workers serving stale pages. The database cache needs
+# "python manage.py createcachetable" once; use RedisCache where Redis is
+# available.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'shopsmart_cache',
+        # Culling could drop a version counter and reuse an old version number
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 